@@ -1,214 +1,618 @@
 import cv2
-import mediapipe as mp
-import numpy as np
-from tkinter import messagebox
 import time
-import cv2.dnn
+from models import ModelBundle, load_detector
 import os
-from dotenv import load_dotenv
-load_dotenv()
+import threading
+from contextlib import nullcontext
+from pipeline import FrameReader, RealtimePacer
+from sources import LatencyStats, LatestFrameReader
+from instrumentation import PipelineMetrics, profile_session, shared_metrics
+from events import EVENT_GAZE_LEFT, EVENT_GAZE_RIGHT, EVENT_HIGH_PROBABILITY, EVENT_OBJECT, EventLog
+import features
+from features import as_landmark_array, landmarks_to_array
+from metrics_store import MetricStore
+from face_roi import FaceRoiTracker
+from feature_cache import FEATURE_COLUMNS, FeatureCache
+from detectors import DetectionResult, DetectionScheduler
+from result_sink import COMMIT_FRAMES, COMMIT_SECONDS, ResultSink
+from sampling import DEFAULT_MIN_RATE, MOTION_THRESHOLD, AdaptiveSampler
 
 
-mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5,
-    refine_landmarks=True
-)
-
 FRAME_SKIP = 4  
+DECODE_QUEUE_SIZE = 8
+# Adaptive sampling reacts to analysis results, so the reader may only run
+# a couple of samples ahead of them
+ADAPTIVE_QUEUE_SIZE = 2
+YOLO_BATCH_SIZE = 4
+DETECTION_INTERVAL = 1
+STREAM_LATENCY_TARGET = 0.25
+
+_NO_STAGE = nullcontext()
+
+RUN_MODE_MAX_THROUGHPUT = "max_throughput"
+RUN_MODE_REALTIME = "realtime"
 
 
 class VideoAnalyzer:
-    def __init__(self):
+    def __init__(self, models=None, run_mode=None):
         self.video_path = None
-        self.cheating_events = []
+        self.events = EventLog(max_gap=2 * FRAME_SKIP)
         self.frame_count = 0
         self.final_result = "Pending"
         self.is_analyzing = False
         self.current_frame = None
         self.current_probability = 0
-        self.pause_analysis = False
         self.fps = 0
+        self.run_mode = run_mode or os.getenv('RUN_MODE', RUN_MODE_MAX_THROUGHPUT)
+        self.dropped_frames = 0
+        self._resume_event = threading.Event()
+        self._resume_event.set()
         
-        self.net = None
-        self.classes = []
-        if os.getenv('USE_YOLO', 'false').lower() == 'true':
-            self.init_yolo()
+        # Models are built on first use (or by models.warm_up), not here
+        self.models = models if models is not None else ModelBundle()
+        self.detect_batch_size = int(os.getenv('YOLO_BATCH_SIZE', str(YOLO_BATCH_SIZE)))
+        self.detection_interval = int(os.getenv('DETECTION_INTERVAL', str(DETECTION_INTERVAL)))
+        self.detection_scheduler = None
+        self.detections = []
+        self.use_face_roi = os.getenv('FACE_ROI', 'false').lower() == 'true'
+        self.face_tracker = None
+        self.adaptive_sampling = os.getenv('ADAPTIVE_SAMPLING', 'false').lower() == 'true'
+        self.sampler = None
+
+        self.feature_cache = None
+        self.cache_status = None
+        self.recorder = None
+        self.latency = None
+        if os.getenv('FEATURE_CACHE_DIR'):
+            self.feature_cache = FeatureCache(
+                os.getenv('FEATURE_CACHE_DIR'),
+                max_bytes=int(os.getenv('FEATURE_CACHE_MAX_MB', '2048')) << 20
+            )
+
+        # Results streamed to disk while analyzing, so a crash can be resumed
+        self.result_sink = None
+        self.sink_session = None
+        if os.getenv('RESULT_DB'):
+            self.result_sink = ResultSink(
+                os.getenv('RESULT_DB'),
+                commit_frames=int(os.getenv('RESULT_COMMIT_FRAMES', str(COMMIT_FRAMES))),
+                commit_seconds=float(os.getenv('RESULT_COMMIT_SECONDS', str(COMMIT_SECONDS)))
+            )
         
         self.baseline_eye = None
         self.baseline_head = None
         self.smoothed_probability = 0
-        self.time_data = []
-        self.eye_tracking_data = []
-        self.head_movement_data = []
-        self.mouth_movement_data = []
-        self.cheating_probability_data = []
+        self.metrics = MetricStore()
         self.mouth_movement_count = 0
-        self.ui_callback = None
+        # Optional instrumentation.StageTimer; stages cost nothing when unset
+        self.timer = None
+        self.metrics_exporter = None
+        if os.getenv('METRICS_FILE') or os.getenv('METRICS_JSON'):
+            # One metrics store and exporter thread per process, shared by
+            # every analyzer in it
+            self.timer, self.metrics_exporter = shared_metrics(
+                os.getenv('METRICS_FILE'), os.getenv('METRICS_JSON'),
+                interval=float(os.getenv('METRICS_INTERVAL', '5'))
+            )
+        self.profile_mode = os.getenv('PROFILE')
+        self.profile_dir = os.getenv('PROFILE_DIR', 'profiles')
+
+    def _stage(self, name):
+        return _NO_STAGE if self.timer is None else self.timer.stage(name)
+
+    def metrics_snapshot(self):
+        """JSON-serializable view of the process-wide pipeline instrumentation, None when it is off"""
+        if isinstance(self.timer, PipelineMetrics):
+            return self.timer.snapshot()
+        return None
+
+    @property
+    def face_mesh(self):
+        return self.models.face_mesh
+
+    @property
+    def detector(self):
+        return self.models.detector
+
+    @property
+    def net(self):
+        return self.models.net
+
+    @property
+    def classes(self):
+        return self.models.classes
+
+    @property
+    def time_data(self):
+        return self.metrics.view("time")
+
+    @property
+    def eye_tracking_data(self):
+        return self.metrics.view("eye_tracking")
+
+    @property
+    def head_movement_data(self):
+        return self.metrics.view("head_movement")
+
+    @property
+    def mouth_movement_data(self):
+        return self.metrics.view("mouth_movement")
+
+    @property
+    def cheating_probability_data(self):
+        return self.metrics.view("cheating_probability")
+
+    @property
+    def pause_analysis(self):
+        return not self._resume_event.is_set()
+
+    @pause_analysis.setter
+    def pause_analysis(self, paused):
+        if paused:
+            self._resume_event.clear()
+        else:
+            self._resume_event.set()
+
+    def stop(self):
+        """Stop a running analysis, waking it up if it is paused"""
+        self.is_analyzing = False
+        self._resume_event.set()
 
     def init_yolo(self):
-        """Initialize YOLO using paths from .env"""
-        try:
-            weights_path = os.getenv('YOLO_WEIGHTS_PATH', 'yolov4.weights')
-            cfg_path = os.getenv('YOLO_CONFIG_PATH', 'yolov4.cfg')
-            names_path = os.getenv('YOLO_NAMES_PATH', 'coco.names')
+        """Initialize the object detector selected in .env"""
+        self.models.set_detector(load_detector())
+
+    def create_sampler(self):
+        """AdaptiveSampler configured from .env for the current video's fps"""
+        max_rate = os.getenv('SAMPLING_MAX_FPS')
+        return AdaptiveSampler(
+            self.fps,
+            min_rate=float(os.getenv('SAMPLING_MIN_FPS', str(DEFAULT_MIN_RATE))),
+            max_rate=float(max_rate) if max_rate else None,
+            frame_skip=FRAME_SKIP,
+            motion_threshold=float(os.getenv('SAMPLING_MOTION_THRESHOLD', str(MOTION_THRESHOLD)))
+        )
 
-            if not all(os.path.exists(p) for p in [weights_path, cfg_path, names_path]):
-                print("YOLO files missing, object detection disabled")
-                return
+    def calibrate(self, landmarks, shape):
+        self.baseline_eye = self.get_eye_tracking(landmarks, shape)
+        self.baseline_head = self.get_head_movement(landmarks, shape)
 
-            self.net = cv2.dnn.readNet(weights_path, cfg_path)
-            
-            with open(names_path, "r") as f:
-                self.classes = [line.strip() for line in f.readlines()]
-                
-            print("YOLO initialized successfully")
-        except Exception as e:
-            print(f"YOLO initialization failed: {str(e)}")
-            self.net = None
+    def detect_objects(self, frame):
+        """Detect prohibited objects in a single frame"""
+        return self.detect_objects_batch([frame])[0]
 
-    def calibrate(self, face_landmarks, shape):
-        self.baseline_eye = self.get_eye_tracking(face_landmarks, shape)
-        self.baseline_head = self.get_head_movement(face_landmarks, shape)
+    def detect_objects_batch(self, frames):
+        """Run the detector once over a window of frames, returns one DetectionResult per frame"""
+        if self.detector is None:
+            return [DetectionResult() for _ in frames]
 
-    def detect_objects(self, frame):
-        """Detect prohibited objects with better filtering"""
-        if self.net is None:
-            return False
-            
-        prohibited_objects = ["cell phone", "book", "laptop", "paper"]
-        
         try:
-            blob = cv2.dnn.blobFromImage(frame, 1/255, (416, 416), swapRB=True)
-            self.net.setInput(blob)
-            outputs = self.net.forward(self.net.getUnconnectedOutLayersNames())
-            
-            for output in outputs:
-                for detection in output:
-                    scores = detection[5:]
-                    class_id = np.argmax(scores)
-                    confidence = scores[class_id]
-                    
-                    if confidence > 0.5 and class_id < len(self.classes):
-                        class_name = self.classes[class_id].lower()
-                        if any(obj in class_name for obj in prohibited_objects):
-                            return True
-            return False
+            with self._stage("yolo"):
+                results = self.detector.detect_batch(frames)
+            if self.timer is not None:
+                self.timer.count("detector_frames", len(frames))
+            return results
         except Exception as e:
             print(f"Object detection error: {str(e)}")
-            return False
+            return [DetectionResult() for _ in frames]
 
     def reset_data(self):
-        self.time_data.clear()
-        self.eye_tracking_data.clear()
-        self.head_movement_data.clear()
-        self.mouth_movement_data.clear()
-        self.cheating_probability_data.clear()
+        self.metrics.clear()
         self.mouth_movement_count = 0
-        self.cheating_events.clear()
+        self.events.clear()
         self.frame_count = 0
         self.final_result = "Pending"
         self.current_probability = 0
         self.smoothed_probability = 0
-
-    def analyze_video(self, video_path, frame_callback=None, progress_callback=None):
+        self.dropped_frames = 0
+        self.detections.clear()
+        self.cache_status = None
+        self.latency = None
+        # Analyzers are reused across videos (batch and chunk workers), so
+        # tracking must not carry over from the previous one
+        self.models.reset_tracking()
+        self.face_tracker = FaceRoiTracker(self.face_mesh) if self.use_face_roi else None
+        self.detection_scheduler = None
+        self.sampler = None
+        if self.detector is not None and self.detection_interval > 1:
+            self.detection_scheduler = DetectionScheduler(self.detection_interval)
+
+    def analyze_video(self, video_path, frame_callback=None, progress_callback=None, start_frame=0, end_frame=None):
+        """Analyze a video file, or only frames (start_frame, end_frame] of it"""
+        try:
+            with profile_session(self.profile_mode, self.profile_dir, video_path):
+                return self._analyze_video(video_path, frame_callback, progress_callback, start_frame, end_frame)
+        finally:
+            if self.recorder is not None:
+                # Not stored: the analysis was stopped, dropped frames or failed
+                self.recorder.discard()
+                self.recorder = None
+            if self.sink_session is not None:
+                self.sink_session.close()
+                self.sink_session = None
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.write()
+
+    def _analyze_video(self, video_path, frame_callback, progress_callback, start_frame, end_frame):
         self.reset_data()
+        self.video_path = video_path
         self.is_analyzing = True
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
-            messagebox.showerror("Error", "Cannot open video file.")
+            print(f"Cannot open video file: {video_path}")
             self.is_analyzing = False
-            return
+            return False
 
         self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.events.fps = self.fps
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_skip_count = 0
+        if self.adaptive_sampling:
+            self.sampler = self.create_sampler()
+        self.events.max_gap = 2 * (self.sampler.max_skip if self.sampler else FRAME_SKIP)
+
+        partial = start_frame > 0 or end_frame is not None
+        session = None
+        if self.result_sink is not None and not partial:
+            session = self.sink_session = self.result_sink.open_session(video_path, self.fps, self.cache_settings())
+            if session.resumed:
+                # Carry on from the last committed frame instead of frame 0
+                session.restore(self)
+                start_frame = session.resumed_from
+                print(f"Resuming {video_path} from frame {start_frame}")
+
+        cache_key = None
+        resumed = session is not None and session.resumed
+        if self.feature_cache is not None and self.run_mode != RUN_MODE_REALTIME and not partial and not resumed:
+            cache_key = self.feature_cache.key(video_path, self.cache_settings())
+            entry = self.feature_cache.load(cache_key)
+            if entry is not None:
+                cap.release()
+                self.cache_status = "hit"
+                self.replay_cached(entry, progress_callback)
+                self.generate_final_result()
+                if session is not None:
+                    session.finish(self)
+                self.is_analyzing = False
+                return True
+            self.cache_status = "miss"
+            self.recorder = self.feature_cache.recorder()
+
+        pacer = None
+        if self.run_mode == RUN_MODE_REALTIME:
+            # A frame is dropped once it is a whole sampling interval late
+            pacer = RealtimePacer(self.fps, late_tolerance=FRAME_SKIP / (self.fps or 30.0))
+
+        reader = FrameReader(
+            cap, FRAME_SKIP, queue_size=ADAPTIVE_QUEUE_SIZE if self.sampler else DECODE_QUEUE_SIZE,
+            start_frame=start_frame, end_frame=end_frame, timer=self.timer, sampler=self.sampler
+        )
+        reader.start()
+        try:
+            for frame_number, frame, detection in self._sampled_frames(reader):
+                if self.pause_analysis:
+                    paused_at = time.perf_counter()
+                    self._resume_event.wait()
+                    if pacer:
+                        pacer.shift(time.perf_counter() - paused_at)
+                if not self.is_analyzing:
+                    break
+
+                self.frame_count = frame_number
+                if pacer and not pacer.wait(frame_number):
+                    self.dropped_frames += 1
+                    if self.timer is not None:
+                        self.timer.count("dropped_frames")
+                    continue
+                self.process_frame(frame, detection)
+                if self.timer is not None:
+                    self.timer.count("frames_processed")
+                    self.timer.gauge("decode_queue_depth", reader.queue.qsize())
+                if session is not None:
+                    session.frame_done(self)
+
+                with self._stage("callbacks"):
+                    if frame_callback:
+                        frame_callback(frame)
+
+                    if progress_callback and total_frames > 0:
+                        progress = (self.frame_count / total_frames) * 100
+                        progress_callback(progress)
+        finally:
+            reader.stop()
+            reader.join()
+            cap.release()
+
+        # The reader can reach the end while the loop is stopped with frames
+        # still queued; only a fully consumed, unstopped run is complete
+        completed = reader.finished and reader.drained and self.is_analyzing
+        if session is not None and not completed:
+            # Stopped early: commit while intervals are still open so a
+            # resumed run can keep extending them
+            session.commit(self)
+        if completed:
+            self.frame_count = reader.frames_read
+            if cache_key is not None and self.dropped_frames == 0:
+                self.store_cached(cache_key)
+        self.generate_final_result()
+        if session is not None and completed:
+            session.finish(self)
+        self.is_analyzing = False
+        return True
 
-        while cap.isOpened() and self.is_analyzing:
-            if self.pause_analysis:
-                time.sleep(0.1)
-                continue
-                
-            ret, frame = cap.read()
-            if not ret:
-                break
+    def analyze_stream(self, source, frame_callback=None, latency_target=None, max_seconds=None):
+        """Analyze a live source (see sources.open_source) until it ends, stop() is called or Ctrl-C is pressed.
+
+        Always works on the newest captured frame: whatever arrived while the
+        previous one was being processed is dropped. Frames that are already
+        older than latency_target seconds when picked up are skipped too.
+        frame_count follows the source's own frame sequence, so timestamps
+        and events line up with capture time even when frames are dropped.
+        """
+        self.reset_data()
+        self.video_path = getattr(source, "path", None) or "stream"
+        self.is_analyzing = True
+        if not source.isOpened():
+            print("Cannot open stream source")
+            self.is_analyzing = False
+            return False
 
-            self.frame_count += 1
-            frame_skip_count += 1
+        self.fps = source.get(cv2.CAP_PROP_FPS) or 30.0
+        self.events.fps = self.fps
+        if latency_target is None:
+            latency_target = float(os.getenv('STREAM_LATENCY_TARGET_MS', str(STREAM_LATENCY_TARGET * 1000))) / 1000
+        self.latency = LatencyStats()
+        last_detection = DetectionResult()
 
-            if frame_skip_count < FRAME_SKIP:
-                continue
-            frame_skip_count = 0
+        reader = LatestFrameReader(source)
+        reader.start()
+        started = time.perf_counter()
+        try:
+            for frame_number, captured_at, frame in reader:
+                if self.pause_analysis:
+                    self._resume_event.wait()
+                    continue
+                if not self.is_analyzing:
+                    break
+                if max_seconds is not None and time.perf_counter() - started > max_seconds:
+                    break
+                if time.perf_counter() - captured_at > latency_target:
+                    self.dropped_frames += 1
+                    if self.timer is not None:
+                        self.timer.count("dropped_frames")
+                    continue
+
+                self.frame_count = frame_number
+                detection = None
+                if self.detector is not None:
+                    if self.detection_scheduler is None or self.detection_scheduler.needs_detection(frame):
+                        last_detection = self.detect_objects(frame)
+                    detection = last_detection
+                self.process_frame(frame, detection)
+                self.latency.add(time.perf_counter() - captured_at, latency_target)
+                if self.timer is not None:
+                    self.timer.count("frames_processed")
+                    self.timer.gauge("source_dropped_frames", reader.dropped)
+
+                if frame_callback:
+                    with self._stage("callbacks"):
+                        frame_callback(frame)
+        except KeyboardInterrupt:
+            # Ctrl-C is how a camera stream without a duration is ended
+            pass
+        finally:
+            reader.stop()
+            reader.join(timeout=2)
+            source.release()
+
+        self.dropped_frames += reader.dropped
+        self.frame_count = reader.frames_read
+        self.generate_final_result()
+        self.is_analyzing = False
+        return True
 
-            object_detected = False
-            if self.net is not None:
-                object_detected = self.detect_objects(frame)
-                if object_detected:
-                    self.log_cheating_event(self.frame_count, "Forbidden object detected")
+    def _sampled_frames(self, reader):
+        """Yield (frame_number, frame, detection), running YOLO over windows of decoded frames"""
+        if self.detector is None:
+            for frame_number, frame in reader:
+                yield frame_number, frame, None
+            return
 
+        last_detection = DetectionResult()
+        for window in reader.batches(self.detect_batch_size):
+            frames = [frame for _, frame in window]
+            if self.detection_scheduler:
+                needed = [self.detection_scheduler.needs_detection(frame) for frame in frames]
+            else:
+                needed = [True] * len(frames)
+
+            fresh = [frame for frame, need in zip(frames, needed) if need]
+            fresh_detections = iter(self.detect_objects_batch(fresh) if fresh else [])
+            for (frame_number, frame), need in zip(window, needed):
+                # Between scheduled runs the last result is carried forward
+                if need:
+                    last_detection = next(fresh_detections)
+                yield frame_number, frame, last_detection
+
+    def detect_faces(self, frame):
+        """Run FaceMesh on a BGR frame, returns (N, 3) landmark arrays in full-frame normalized coordinates"""
+        if self.face_tracker is not None:
+            # Crop selection and conversion are part of the tracker
+            with self._stage("face_mesh"):
+                return self.face_tracker.process(frame)
+        with self._stage("color_convert"):
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = mp_face_mesh.process(rgb_frame)
-
-            if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    if self.frame_count < 10:
-                        self.calibrate(face_landmarks, frame.shape)
-                        continue
-
-                    eye_tracking = self.get_eye_tracking(face_landmarks, frame.shape)
-                    head_movement = self.get_head_movement(face_landmarks, frame.shape)
-                    mouth_movement = self.get_mouth_movement(face_landmarks)
-                    gaze_direction = self.get_gaze_direction(face_landmarks)
-
-                    elapsed_time = self.frame_count / self.fps
-                    self.time_data.append(elapsed_time)
-                    self.eye_tracking_data.append(eye_tracking)
-                    self.head_movement_data.append(head_movement)
-                    self.mouth_movement_data.append(mouth_movement)
-
-                    if mouth_movement > 5:
-                        self.mouth_movement_count += 1
-
-                    cheating_probability = self.calculate_cheating_probability(
-                        eye_tracking, 
-                        head_movement, 
-                        mouth_movement, 
-                        is_silent_section=True,
-                        object_detected=object_detected
-                    )
-                    cheating_probability = self.update_smoothed_probability(cheating_probability)
-                    self.cheating_probability_data.append(cheating_probability)
-                    self.current_probability = cheating_probability
-
-                    if cheating_probability > 60:
-                        self.log_cheating_event(self.frame_count, f"High cheating probability: {cheating_probability:.2f}%")
-                    if gaze_direction != "CENTER":
-                        self.log_cheating_event(self.frame_count, f"Suspicious gaze: {gaze_direction}")
-                    
-                    self.draw_metrics_on_frame(
-                        frame, 
-                        eye_tracking, 
-                        head_movement, 
-                        mouth_movement, 
-                        cheating_probability,
-                        object_detected=object_detected
-                    )
-            
-            self.current_frame = frame
+        with self._stage("face_mesh"):
+            results = self.face_mesh.process(rgb_frame)
+        if not results.multi_face_landmarks:
+            return []
+        return [landmarks_to_array(face_landmarks) for face_landmarks in results.multi_face_landmarks]
+
+    def process_frame(self, frame, detection=None):
+        """Run detection, face mesh and scoring on one sampled frame, drawing the overlay in place"""
+        self.events.tick(self.frame_count)
+        if detection is None and self.detector is not None:
+            detection = self.detect_objects(frame)
+        object_detected = bool(detection)
+        if object_detected:
+            if not self.detections or self.detections[-1][1] is not detection:
+                self.detections.append((self.frame_count, detection))
+            self.log_cheating_event(self.frame_count, EVENT_OBJECT, float(detection.confidences.max()))
+
+        faces = self.detect_faces(frame)
+        first_scores = None
+        for landmarks in faces:
+            with self._stage("features_scoring"):
+                frame_features = features.compute_features(landmarks)
+                if self.recorder is not None and landmarks is faces[0]:
+                    self.recorder.record(self.frame_count, landmarks, frame_features, object_detected)
+
+                scores = self.score_features(landmarks, frame_features, object_detected, frame.shape)
+            if scores is None:
+                continue
+            eye_tracking, head_movement, mouth_movement, cheating_probability = scores
+            if first_scores is None:
+                first_scores = scores
             
-            if frame_callback:
-                frame_callback(frame)
-                
-            if progress_callback and total_frames > 0:
-                progress = (self.frame_count / total_frames) * 100
-                progress_callback(progress)
-                
-            time.sleep(0.01)
-
-        cap.release()
-        self.generate_final_result()
-        self.is_analyzing = False
+            with self._stage("overlay"):
+                self.draw_metrics_on_frame(
+                    frame, 
+                    eye_tracking, 
+                    head_movement, 
+                    mouth_movement, 
+                    cheating_probability,
+                    object_detected=object_detected
+                )
+        if not faces and self.recorder is not None:
+            self.recorder.record(self.frame_count, None, None, object_detected)
+        if self.sampler is not None:
+            self.sampler.observe(self.frame_count, first_scores, bool(faces), object_detected)
+
+        self.current_frame = frame
+
+    def score_features(self, landmarks, frame_features, object_detected, shape=None):
+        """Turn one face's features into metrics, probability and events.
+
+        Returns (eye, head, mouth, probability), or None for calibration frames.
+        """
+        if self.frame_count < 10:
+            self.calibrate(landmarks, shape)
+            return None
+
+        eye_tracking = float(frame_features["eye_tracking"])
+        head_movement = float(frame_features["head_movement"])
+        mouth_movement = float(frame_features["mouth_movement"])
+        gaze_direction = str(features.gaze_direction(frame_features["gaze_x"]))
+
+        elapsed_time = self.frame_count / self.fps
+
+        if mouth_movement > 5:
+            self.mouth_movement_count += 1
+
+        cheating_probability = self.calculate_cheating_probability(
+            eye_tracking, 
+            head_movement, 
+            mouth_movement, 
+            is_silent_section=True,
+            object_detected=object_detected
+        )
+        cheating_probability = self.update_smoothed_probability(cheating_probability)
+        self.metrics.append(
+            time=elapsed_time,
+            eye_tracking=eye_tracking,
+            head_movement=head_movement,
+            mouth_movement=mouth_movement,
+            cheating_probability=cheating_probability
+        )
+        self.current_probability = cheating_probability
+
+        if cheating_probability > 60:
+            self.log_cheating_event(self.frame_count, EVENT_HIGH_PROBABILITY, cheating_probability)
+        if gaze_direction == "LEFT":
+            self.log_cheating_event(self.frame_count, EVENT_GAZE_LEFT)
+        elif gaze_direction == "RIGHT":
+            self.log_cheating_event(self.frame_count, EVENT_GAZE_RIGHT)
+
+        return eye_tracking, head_movement, mouth_movement, cheating_probability
+
+    def cache_settings(self):
+        """Every setting that changes the raw per-frame outputs, part of the cache key"""
+        return {
+            "frame_skip": FRAME_SKIP,
+            "face_roi": self.use_face_roi,
+            "detection_interval": self.detection_interval if self.detector is not None else None,
+            "sampling": self.sampler.settings() if self.sampler else None,
+            "models": self.models.signature(),
+        }
+
+    def store_cached(self, key):
+        meta = {
+            "video": self.video_path,
+            "video_hash": self.feature_cache.video_hash(self.video_path),
+            "fps": self.fps,
+            "frame_count": self.frame_count,
+            "settings": self.cache_settings(),
+            "detections": self.to_record()["detections"],
+        }
+        try:
+            self.feature_cache.store(key, self.recorder, meta)
+        except Exception as e:
+            print(f"Feature cache write failed: {str(e)}")
+        self.recorder = None
+
+    def replay_cached(self, entry, progress_callback=None):
+        """Re-score a cached analysis without decoding or running any model"""
+        meta = entry.meta
+        self.fps = meta["fps"]
+        self.events.fps = self.fps
+        feature_rows = entry["features"]
+        landmark_rows = entry["landmarks"]
+        detections = {d["frame"]: DetectionResult.from_dict(d) for d in meta["detections"]}
+
+        face_row = 0
+        for i, frame_number in enumerate(entry["frame_numbers"]):
+            if not self.is_analyzing:
+                break
+            self.frame_count = int(frame_number)
+            self.events.tick(self.frame_count)
+            object_detected = bool(entry["object_detected"][i])
+            if object_detected:
+                confidence = None
+                if self.frame_count in detections:
+                    self.detections.append((self.frame_count, detections[self.frame_count]))
+                    confidence = float(detections[self.frame_count].confidences.max())
+                self.log_cheating_event(self.frame_count, EVENT_OBJECT, confidence)
+            if entry["has_face"][i]:
+                frame_features = dict(zip(FEATURE_COLUMNS, feature_rows[face_row]))
+                self.score_features(landmark_rows[face_row], frame_features, object_detected)
+                face_row += 1
+
+        self.frame_count = meta["frame_count"]
+        if progress_callback:
+            progress_callback(100)
+
+    def to_record(self):
+        """Collect the results of the last analysis as a JSON-serializable dict"""
+        return {
+            "video": self.video_path,
+            "final_result": self.final_result,
+            "fps": self.fps,
+            "frame_count": self.frame_count,
+            "mouth_movement_count": self.mouth_movement_count,
+            "frames": self.metrics.to_dict(),
+            "events": self.cheating_events,
+            "event_intervals": self.events.to_dicts(),
+            "detector": self.detection_scheduler.stats() if self.detection_scheduler else None,
+            "detector_model": self.detector.describe() if self.detector is not None else None,
+            "face_roi": self.face_tracker.stats() if self.face_tracker else None,
+            "sampling": self.sampler.stats() if self.sampler else None,
+            "cache": self.cache_status,
+            "latency": dict(self.latency.summary(), dropped=self.dropped_frames) if self.latency else None,
+            "detections": [
+                dict(frame=frame_num, **detection.to_dict())
+                for frame_num, detection in self.detections
+            ],
+        }
     
     def draw_metrics_on_frame(self, frame, eye_tracking, head_movement, mouth_movement, cheating_probability, object_detected=False):
         """Draw metrics on the video frame with object detection warning"""
@@ -239,40 +643,20 @@ class VideoAnalyzer:
             cv2.putText(frame, f"Talking Events: {self.mouth_movement_count}", 
                         (w - 200, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 1)
 
-    def get_eye_tracking(self, face_landmarks, shape):
-        left_eye = face_landmarks.landmark[33]
-        right_eye = face_landmarks.landmark[263]
-        face_width = abs(face_landmarks.landmark[454].x - face_landmarks.landmark[234].x)
-        return abs(left_eye.x - right_eye.x) / face_width * 100
+    def get_eye_tracking(self, landmarks, shape):
+        return float(features.eye_tracking(as_landmark_array(landmarks)))
 
-    def get_head_movement(self, face_landmarks, shape):
-        nose = face_landmarks.landmark[1]
-        face_width = abs(face_landmarks.landmark[454].x - face_landmarks.landmark[234].x)
-        return abs(nose.x - 0.5) / face_width * 200
+    def get_head_movement(self, landmarks, shape):
+        return float(features.head_movement(as_landmark_array(landmarks)))
 
-    def get_gaze_direction(self, face_landmarks):
-        try:
-            left_eye_inner = face_landmarks.landmark[33]
-            left_eye_outer = face_landmarks.landmark[133]
-            right_eye_inner = face_landmarks.landmark[362]
-            right_eye_outer = face_landmarks.landmark[263]
-            
-            left_eye_h = (left_eye_inner.x + left_eye_outer.x) / 2
-            right_eye_h = (right_eye_inner.x + right_eye_outer.x) / 2
-
-            gaze_x = (left_eye_h + right_eye_h) / 2
-            if gaze_x < 0.4:
-                return "LEFT"
-            elif gaze_x > 0.6:
-                return "RIGHT"
+    def get_gaze_direction(self, landmarks):
+        lm = as_landmark_array(landmarks)
+        if lm.shape[-2] <= features.FACE_RIGHT:
             return "CENTER"
-        except (IndexError, AttributeError):
-            return "CENTER" 
+        return str(features.gaze_direction(features.gaze_x(lm)))
         
-    def get_mouth_movement(self, face_landmarks):
-        upper_lip = face_landmarks.landmark[13].y
-        lower_lip = face_landmarks.landmark[14].y
-        return abs(upper_lip - lower_lip) * 100
+    def get_mouth_movement(self, landmarks):
+        return float(features.mouth_movement(as_landmark_array(landmarks)))
 
     def calculate_cheating_probability(self, eye_tracking, head_movement, mouth_movement, is_silent_section=True, object_detected=False):
         """Calculate cheating probability with object detection penalty"""
@@ -307,22 +691,25 @@ class VideoAnalyzer:
         self.smoothed_probability = 0.9 * self.smoothed_probability + 0.1 * new_probability
         return self.smoothed_probability
 
-    def log_cheating_event(self, frame_num, event_type):
-        timestamp = round(frame_num / 30, 2)
-        log_msg = f"Time: {timestamp}s - {event_type}\n"
-        self.cheating_events.append(log_msg)
-        if self.ui_callback:
-            self.ui_callback(log_msg)
+    @property
+    def cheating_events(self):
+        """Formatted log lines, one per coalesced event interval"""
+        return self.events.formatted()
+
+    def log_cheating_event(self, frame_num, event_type, value=None):
+        self.events.observe(event_type, frame_num, value)
 
     def generate_final_result(self):
-        if len(self.cheating_probability_data) == 0:
-            self.final_result = "No data available"
-            return
-        if self.mouth_movement_count > 5:
-            self.final_result = "Rejected (Excessive Talking)"
-            return
-        avg_cheating_probability = sum(self.cheating_probability_data) / len(self.cheating_probability_data)
-        if avg_cheating_probability > 50:
-            self.final_result = "Rejected (Suspicious Behavior)"
-        else:
-            self.final_result = "Selected (No Suspicious Behavior)"
+        self.events.close_all()
+        self.final_result = final_verdict(self.metrics, self.mouth_movement_count)
+
+
+def final_verdict(metrics, mouth_movement_count):
+    """Verdict for a whole session from its metric store and talking count"""
+    if len(metrics) == 0:
+        return "No data available"
+    if mouth_movement_count > 5:
+        return "Rejected (Excessive Talking)"
+    if metrics.mean("cheating_probability") > 50:
+        return "Rejected (Suspicious Behavior)"
+    return "Selected (No Suspicious Behavior)"
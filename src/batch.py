@@ -0,0 +1,133 @@
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+_worker_analyzer = None
+
+
+def collect_videos(inputs):
+    """Expand directories and glob patterns into a sorted list of video files"""
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(item, name))
+        elif os.path.isfile(item):
+            videos.append(item)
+        else:
+            videos.extend(
+                path for path in sorted(glob.glob(item, recursive=True))
+                if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+            )
+    seen = set()
+    return [v for v in videos if not (os.path.abspath(v) in seen or seen.add(os.path.abspath(v)))]
+
+
+def _init_worker():
+    # Each worker process builds its own FaceMesh/YOLO instances once and
+    # reuses them for every video it is handed.
+    global _worker_analyzer
+    from analyzer import VideoAnalyzer, RUN_MODE_MAX_THROUGHPUT
+    _worker_analyzer = VideoAnalyzer(run_mode=RUN_MODE_MAX_THROUGHPUT)
+
+
+def analyze_to_record(analyzer, video_path, progress_callback=None):
+    start = time.perf_counter()
+    ok = analyzer.analyze_video(video_path, progress_callback=progress_callback)
+    record = analyzer.to_record()
+    record["status"] = "ok" if ok else "error"
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def _analyze_one(video_path):
+    return analyze_to_record(_worker_analyzer, video_path)
+
+
+def _analyze_in_session(model_pool, video_path):
+    from analyzer import RUN_MODE_MAX_THROUGHPUT
+    with model_pool.session(run_mode=RUN_MODE_MAX_THROUGHPUT) as analyzer:
+        return analyze_to_record(analyzer, video_path)
+
+
+def result_paths(output_dir, videos):
+    """Map each video to its JSON result path, unique across the whole batch.
+
+    Paths mirror the videos' layout below their common directory, so
+    d1/cam.avi and d2/cam.avi become d1/cam.json and d2/cam.json. Videos
+    that differ only by extension keep it in the name (cam.avi.json).
+    """
+    videos = [os.path.abspath(v) for v in videos]
+    root = os.path.commonpath([os.path.dirname(v) for v in videos]) if videos else ""
+    stems = [os.path.splitext(os.path.relpath(v, root))[0] for v in videos]
+    paths = {}
+    for video, stem in zip(videos, stems):
+        name = os.path.relpath(video, root) if stems.count(stem) > 1 else stem
+        paths[video] = os.path.join(output_dir, f"{name}.json")
+    return paths
+
+
+def run_batch(inputs, output_dir, workers=None, threads=None):
+    """Analyze every video matched by inputs in a process pool.
+
+    With threads set, sessions instead run on a thread pool inside this
+    process, each borrowing warmed-up models from a shared ModelPool.
+    Writes one JSON result record per video into output_dir and returns
+    a list of (video_path, final_result, status) tuples.
+    """
+    videos = collect_videos(inputs)
+    if not videos:
+        print("No videos found")
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = result_paths(output_dir, videos)
+    if threads:
+        return _run_threaded(videos, outputs, min(threads, len(videos)))
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(videos))
+    print(f"Analyzing {len(videos)} videos with {workers} workers")
+
+    # spawn keeps MediaPipe's graph threads out of the forked children
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {pool.submit(_analyze_one, video): video for video in videos}
+        return _collect(futures, outputs)
+
+
+def _run_threaded(videos, outputs, threads):
+    from models import ModelPool
+    print(f"Analyzing {len(videos)} videos with {threads} sessions")
+    model_pool = ModelPool(size=threads)
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = {pool.submit(_analyze_in_session, model_pool, video): video for video in videos}
+            return _collect(futures, outputs)
+    finally:
+        model_pool.close()
+
+
+def _collect(futures, outputs):
+    summary = []
+    for future in as_completed(futures):
+        video = futures[future]
+        try:
+            record = future.result()
+        except Exception as e:
+            print(f"{video}: analysis failed: {str(e)}")
+            record = {"video": video, "status": "error", "error": str(e), "final_result": None}
+
+        path = outputs[os.path.abspath(video)]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(record, f)
+        summary.append((video, record["final_result"], record["status"]))
+        print(f"{video}: {record['final_result']}")
+    return summary
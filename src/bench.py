@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+BENCH_FPS = 30
+BENCH_SEED = 1234
+# Portrait pasted into the default cases so FaceMesh, scoring and the
+# overlay have a face to work on (crop of a public-domain NASA photo)
+DEFAULT_FACE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_face.jpg")
+# Run the detector too, so its stage is measured whenever the model files exist
+BENCH_ENV = {"USE_YOLO": "true"}
+
+DEFAULT_CASES = (
+    {"name": "360p_10s", "width": 640, "height": 360, "frames": 300},
+    {"name": "720p_10s", "width": 1280, "height": 720, "frames": 300},
+    {"name": "1080p_10s", "width": 1920, "height": 1080, "frames": 300},
+    {"name": "720p_60s", "width": 1280, "height": 720, "frames": 1800},
+)
+QUICK_CASES = (
+    {"name": "360p_4s", "width": 640, "height": 360, "frames": 120},
+    {"name": "720p_4s", "width": 1280, "height": 720, "frames": 120},
+)
+
+# Relative slowdown before compare_results reports a regression, and the
+# smallest per-call stage time worth comparing at all
+REGRESSION_THRESHOLD = 0.10
+MIN_STAGE_MS = 0.05
+
+
+def generate_video(path, width, height, frames, fps=BENCH_FPS, seed=BENCH_SEED, face_image=None):
+    """Write a deterministic synthetic MJPG video.
+
+    A seeded texture background with shapes moving on fixed paths and one
+    hard scene change halfway through. With face_image, that picture is
+    pasted moving across the frame so FaceMesh and scoring get exercised.
+    """
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 256, size=(height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    background = cv2.resize(texture, (width, height), interpolation=cv2.INTER_LINEAR)
+    alternate = cv2.bitwise_not(background)
+
+    face = None
+    if face_image:
+        face = cv2.imread(face_image)
+        if face is None:
+            raise ValueError(f"Cannot read face image: {face_image}")
+        size = height // 2
+        face = cv2.resize(face, (size * face.shape[1] // face.shape[0], size), interpolation=cv2.INTER_AREA)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write benchmark video: {path}")
+    try:
+        for i in range(frames):
+            frame = (background if i < frames // 2 else alternate).copy()
+            t = i / fps
+            for k in range(3):
+                cx = int(width * (0.5 + 0.4 * np.sin(t * (k + 1) * 0.7 + k)))
+                cy = int(height * (0.5 + 0.4 * np.cos(t * (k + 1) * 0.5 + k)))
+                cv2.circle(frame, (cx, cy), height // (8 + 2 * k), (60 * k, 255 - 60 * k, 128), -1)
+            if face is not None:
+                fh, fw = face.shape[:2]
+                x = int((width - fw) * (0.5 + 0.4 * np.sin(t * 0.8)))
+                y = (height - fh) // 2
+                frame[y:y + fh, x:x + fw] = face
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def case_video(case, video_dir, face_image=None):
+    """Path of the case's video in video_dir, generated on first use"""
+    tag = f"_{os.path.splitext(os.path.basename(face_image))[0]}" if face_image else ""
+    name = f"{case['width']}x{case['height']}_{case['frames']}_{BENCH_SEED}{tag}.avi"
+    path = os.path.join(video_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(video_dir, exist_ok=True)
+        tmp_path = path + ".tmp.avi"
+        generate_video(tmp_path, case["width"], case["height"], case["frames"], face_image=face_image)
+        os.replace(tmp_path, path)
+    return path
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _run_case(video_path, env):
+    # Runs in a fresh process so peak RSS belongs to this case alone
+    os.environ.pop("FEATURE_CACHE_DIR", None)
+    os.environ.update(env)
+    from analyzer import VideoAnalyzer, RUN_MODE_MAX_THROUGHPUT
+    from instrumentation import StageTimer
+
+    analyzer = VideoAnalyzer(run_mode=RUN_MODE_MAX_THROUGHPUT)
+    analyzer.models.warm_up()
+    analyzer.timer = StageTimer()
+    start = time.perf_counter()
+    analyzer.analyze_video(video_path)
+    elapsed = time.perf_counter() - start
+
+    stages = analyzer.timer.summary()
+    sampled = stages.get("face_mesh", {}).get("count", 0)
+    record = analyzer.to_record()
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "frames": analyzer.frame_count,
+        "sampled_frames": sampled,
+        "fps": round(analyzer.frame_count / elapsed, 2) if elapsed else None,
+        "sampled_fps": round(sampled / elapsed, 2) if elapsed else None,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+        "detector_batches": stages.get("yolo", {}).get("count", 0),
+        "detector_frames": analyzer.timer.counters.get("detector_frames", 0),
+        "detector_model": record["detector_model"],
+        "detector": record["detector"],
+        "face_roi": record["face_roi"],
+        "sampling": record["sampling"],
+        "scored_frames": len(record["frames"]["time"]),
+    }
+
+
+def run_benchmarks(cases, video_dir, repeat=1, face_image=DEFAULT_FACE_IMAGE, env=None):
+    """Run every case repeat times, each in its own process, keeping the fastest run.
+
+    env overrides BENCH_ENV; face_image=None benchmarks videos without a face.
+    """
+    env = dict(BENCH_ENV, **(env or {}))
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        video_path = case_video(case, video_dir, face_image)
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                runs.append(pool.submit(_run_case, video_path, env).result())
+        best = min(runs, key=lambda r: r["elapsed_s"])
+        best.update(name=case["name"], width=case["width"], height=case["height"], video=video_path)
+        results.append(best)
+        print(f"{case['name']}: {best['fps']} frames/s, {best['sampled_fps']} sampled/s, {best['peak_rss_mb']} MB")
+    return {"meta": environment_info(env, repeat, face_image), "cases": results}
+
+
+def environment_info(env=None, repeat=1, face_image=None):
+    import mediapipe as mp
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "mediapipe": mp.__version__,
+        "numpy": np.__version__,
+        "repeat": repeat,
+        "face_image": face_image,
+        "env": env or {},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """List human-readable regressions of current against baseline, matched by case name"""
+    regressions = []
+    base_cases = {case["name"]: case for case in baseline["cases"]}
+    for case in current["cases"]:
+        base = base_cases.get(case["name"])
+        if base is None:
+            continue
+        name = case["name"]
+        if base["fps"] and case["fps"] < base["fps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {base['fps']} -> {case['fps']} frames/s")
+        if case["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_mb']} -> {case['peak_rss_mb']} MB")
+        for stage, stats in case["stages"].items():
+            before = base["stages"].get(stage)
+            if before is None or max(before["mean_ms"], stats["mean_ms"]) < MIN_STAGE_MS:
+                continue
+            if stats["mean_ms"] > before["mean_ms"] * (1 + threshold):
+                regressions.append(f"{name}: {stage} {before['mean_ms']} -> {stats['mean_ms']} ms per call")
+        # Baselines without detector_frames are skipped
+        if "detector_frames" in base and case["detector_frames"] > base["detector_frames"]:
+            regressions.append(f"{name}: detector frames {base['detector_frames']} -> {case['detector_frames']}")
+    return regressions
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Scored rows (sampled frames with a face, the only ones that advance the
+# EMA) each chunk analyzes before its own range: the smoothed probability
+# at a chunk boundary then differs from a sequential run by at most
+# 100 * 0.9 ** WARMUP_SAMPLES points (< 0.2). The overlap starts at
+# WARMUP_SAMPLES sampled frames and doubles until that many rows were
+# scored, it reaches the start of the video, where the EMA is exact, or it
+# is MAX_WARMUP_FACTOR times its initial size
+WARMUP_SAMPLES = 60
+MAX_WARMUP_FACTOR = 8
+MIN_CHUNK_SAMPLES = 4 * WARMUP_SAMPLES
+
+_worker_analyzer = None
+
+
+def _init_worker():
+    global _worker_analyzer
+    from analyzer import VideoAnalyzer, RUN_MODE_MAX_THROUGHPUT
+    _worker_analyzer = VideoAnalyzer(run_mode=RUN_MODE_MAX_THROUGHPUT)
+
+
+def plan_chunks(total_frames, chunks, frame_skip):
+    """Split frames (0, total_frames] into (start, end) ranges on the sampling grid.
+
+    The last range is open-ended (end None) so it reads to the real end of
+    the file, whatever CAP_PROP_FRAME_COUNT claimed.
+    """
+    step = max(1, total_frames // chunks) // frame_skip * frame_skip
+    if chunks <= 1 or step == 0:
+        return [(0, None)]
+    starts = [i * step for i in range(chunks)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def _warmup_rows(record, start):
+    """Metric rows of a chunk record at or before frame start"""
+    row_frames = np.asarray(record["frames"]["time"], dtype=np.float64) * record["fps"]
+    return int(np.count_nonzero(row_frames <= start + 0.5))
+
+
+def _size_warmup(video_path, start, warmup_samples, frame_skip):
+    """Pick where a chunk's warm-up starts, returns (warmup_start, ok).
+
+    Only the frames each widening adds are analyzed, and the scored rows of
+    those passes are summed, so sizing costs at most one pass over the
+    final overlap.
+    """
+    overlap = warmup_samples * frame_skip
+    max_overlap = MAX_WARMUP_FACTOR * overlap
+    warmup_start = start
+    rows = 0
+    while warmup_start > 0 and rows < warmup_samples:
+        probe_start = max(0, start - overlap)
+        if not _worker_analyzer.analyze_video(video_path, start_frame=probe_start, end_frame=warmup_start):
+            return warmup_start, False
+        rows += len(_worker_analyzer.metrics)
+        warmup_start = probe_start
+        if overlap >= max_overlap:
+            break
+        overlap = min(2 * overlap, max_overlap)
+    return warmup_start, True
+
+
+def _analyze_chunk(video_path, start, end, warmup_samples, frame_skip):
+    begin = time.perf_counter()
+    warmup_start, ok = _size_warmup(video_path, start, warmup_samples, frame_skip)
+    if ok:
+        ok = _worker_analyzer.analyze_video(video_path, start_frame=warmup_start, end_frame=end)
+    record = _worker_analyzer.to_record()
+    return {
+        "start": start,
+        "end": end,
+        "warmup_start": warmup_start,
+        "warmup_rows": _warmup_rows(record, start) if ok else 0,
+        "ok": ok,
+        "record": record,
+        "elapsed_seconds": round(time.perf_counter() - begin, 3),
+    }
+
+
+def merge_chunks(chunk_results, fps):
+    """Stitch per-chunk records into one, dropping every chunk's warm-up rows"""
+    from analyzer import FRAME_SKIP, final_verdict
+    from events import EventLog, EventRecord, merge_records
+    from metrics_store import METRIC_COLUMNS, MetricStore
+
+    chunk_results = sorted(chunk_results, key=lambda c: c["start"])
+    metrics = MetricStore()
+    event_records = []
+    detections = []
+    for chunk in chunk_results:
+        record = chunk["record"]
+        # Row times are float32 frame / fps, so recover frame numbers with
+        # half a frame of slack
+        cut = chunk["start"] + 0.5
+        frames = record["frames"]
+        row_frames = np.asarray(frames["time"], dtype=np.float64) * fps
+        owned = row_frames > cut
+        metrics.extend(**{name: np.asarray(frames[name])[owned] for name in METRIC_COLUMNS})
+        for data in record["event_intervals"]:
+            event = EventRecord.from_dict(data)
+            if event.end_frame <= chunk["start"]:
+                continue
+            if event.start_frame <= chunk["start"]:
+                # Straddles the warm-up: keep only the owned part, the rest
+                # is rejoined with the previous chunk's interval below
+                warmup_samples = (chunk["start"] - event.start_frame) // FRAME_SKIP + 1
+                event.count = max(1, event.count - warmup_samples)
+                event.start_frame = chunk["start"] + 1
+            event_records.append(event)
+        detections.extend(d for d in record["detections"] if d["frame"] > chunk["start"])
+
+    events = EventLog(fps, max_gap=2 * FRAME_SKIP)
+    for event in merge_records(event_records, events.max_gap):
+        events.add_record(event)
+
+    mouth_movement_count = int(np.count_nonzero(metrics.view("mouth_movement") > 5))
+    last = chunk_results[-1]["record"]
+    return {
+        "video": last["video"],
+        "final_result": final_verdict(metrics, mouth_movement_count),
+        "fps": fps,
+        "frame_count": last["frame_count"],
+        "mouth_movement_count": mouth_movement_count,
+        "frames": metrics.to_dict(),
+        "events": events.formatted(),
+        "event_intervals": events.to_dicts(),
+        "detector": None,
+        "face_roi": None,
+        "cache": None,
+        "detections": detections,
+        "status": "ok" if all(c["ok"] for c in chunk_results) else "error",
+        "chunks": [
+            {
+                "start": c["start"],
+                "end": c["end"],
+                "warmup_start": c["warmup_start"],
+                "warmup_rows": c["warmup_rows"],
+                "elapsed_seconds": c["elapsed_seconds"],
+                "detector": c["record"]["detector"],
+                "face_roi": c["record"]["face_roi"],
+            }
+            for c in chunk_results
+        ],
+    }
+
+
+def analyze_chunked(video_path, workers=None, warmup_samples=WARMUP_SAMPLES):
+    """Analyze one video as parallel time ranges and merge them into one record.
+
+    Each worker process seeks to its range minus a warm-up overlap, widened
+    until warmup_samples rows were scored before its own frames start (up
+    to MAX_WARMUP_FACTOR * warmup_samples sampled frames), so
+    FaceMesh tracking and the smoothed probability have settled. Per-frame
+    metrics match a sequential run except for the smoothed probability
+    right after each boundary (see WARMUP_SAMPLES) and for FaceMesh
+    tracking jitter where a chunk re-detects a face the sequential run was
+    tracking; the verdict only differs when the average sits on its
+    threshold. Sizing the overlap analyzes it once and the chunk analyzes
+    it again, so chunks after long faceless stretches take longer.
+    """
+    from analyzer import FRAME_SKIP
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Cannot open video file: {video_path}")
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    max_chunks = max(1, total_frames // (MIN_CHUNK_SAMPLES * FRAME_SKIP))
+    chunks = plan_chunks(total_frames, min(workers, max_chunks), FRAME_SKIP)
+    print(f"Analyzing {video_path} as {len(chunks)} chunks")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=ctx, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(_analyze_chunk, video_path, start, end, warmup_samples, FRAME_SKIP)
+            for start, end in chunks
+        ]
+        results = [future.result() for future in futures]
+    return merge_chunks(results, fps)
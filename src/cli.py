@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+
+
+def cmd_batch(args):
+    if args.cache_dir:
+        # Read by every analyzer, including the ones in spawned workers
+        os.environ["FEATURE_CACHE_DIR"] = args.cache_dir
+    if args.result_db:
+        os.environ["RESULT_DB"] = args.result_db
+    from batch import run_batch
+    summary = run_batch(args.inputs, args.output, workers=args.workers, threads=args.threads)
+    return 0 if summary and all(status == "ok" for _, _, status in summary) else 1
+
+
+def cmd_stream(args):
+    from analyzer import VideoAnalyzer, RUN_MODE_REALTIME
+    from sources import open_source
+    analyzer = VideoAnalyzer(run_mode=RUN_MODE_REALTIME)
+    # Build the models before the camera starts, so the first frames are
+    # not measured (and dropped) while they load
+    analyzer.models.warm_up()
+    latency_target = args.latency_ms / 1000 if args.latency_ms is not None else None
+
+    def print_events(frame):
+        for record in analyzer.events.drain_pending():
+            print(record.format(analyzer.fps), end="")
+
+    try:
+        ok = analyzer.analyze_stream(
+            open_source(args.source), frame_callback=print_events,
+            latency_target=latency_target, max_seconds=args.duration
+        )
+    except KeyboardInterrupt:
+        ok = True
+    print_events(None)
+    record = analyzer.to_record()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(record, f)
+    print(f"{record['final_result']} - latency: {record['latency']}")
+    return 0 if ok else 1
+
+
+def cmd_bench(args):
+    from bench import DEFAULT_CASES, DEFAULT_FACE_IMAGE, QUICK_CASES, run_benchmarks
+    env = dict(item.split("=", 1) for item in args.set)
+    cases = QUICK_CASES if args.quick else DEFAULT_CASES
+    face_image = None if args.no_face else args.face_image or DEFAULT_FACE_IMAGE
+    results = run_benchmarks(cases, args.video_dir, repeat=args.repeat, face_image=face_image, env=env)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+def cmd_bench_compare(args):
+    from bench import compare_results
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare_results(baseline, current, threshold=args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+def cmd_sweep(args):
+    from rescoring import expand_grid, load_cached_videos, sweep
+    with open(args.grid) as f:
+        configs = expand_grid(json.load(f))
+    labels = None
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    videos = load_cached_videos(args.cache_dir, args.videos or None)
+    if not videos:
+        print(f"No cached analyses found in {args.cache_dir}")
+        return 1
+    results = sweep(videos, configs, labels)
+    print(f"Evaluated {len(configs)} configurations on {len(videos)} videos")
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+def cmd_chunked(args):
+    from chunked import analyze_chunked
+    options = {"warmup_samples": args.warmup} if args.warmup is not None else {}
+    record = analyze_chunked(args.video, workers=args.workers, **options)
+    if record is None:
+        return 1
+    with open(args.output, "w") as f:
+        json.dump(record, f)
+    print(f"{args.video}: {record['final_result']}")
+    return 0
+
+
+def cmd_serve(args):
+    from server import serve
+    serve(host=args.host, port=args.port, workers=args.workers, verbose=args.verbose)
+    return 0
+
+
+def cmd_submit(args):
+    from server import submit_job
+    status = None
+    for update in submit_job(args.video, host=args.host, port=args.port, priority=args.priority):
+        if update["type"] == "event":
+            print(update["text"])
+        elif update["type"] == "progress" and args.progress:
+            print(f"{update['percent']}% - probability {update['probability']}%")
+        elif update["type"] == "result":
+            status = update["status"]
+            if args.output and update.get("record") is not None:
+                with open(args.output, "w") as f:
+                    json.dump(update["record"], f)
+            print(f"{args.video}: {update.get('final_result') or update.get('error') or status}")
+    return 0 if status == "done" else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless video proctoring analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="Analyze many recordings in a process pool")
+    batch.add_argument("inputs", nargs="+", help="Video files, directories or glob patterns")
+    batch.add_argument("-o", "--output", default="results", help="Directory for per-video JSON results")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch.add_argument("-t", "--threads", type=int, default=None,
+                       help="Run this many concurrent sessions on threads in one process instead")
+    batch.add_argument("--cache-dir", default=None,
+                       help="Feature cache directory; re-runs with unchanged settings skip decoding and inference")
+    batch.add_argument("--result-db", default=None,
+                       help="SQLite file results are streamed into; interrupted videos resume where they stopped")
+    batch.set_defaults(func=cmd_batch)
+
+    chunked = sub.add_parser("chunked", help="Analyze one long recording as parallel time ranges")
+    chunked.add_argument("video", help="Video file")
+    chunked.add_argument("-o", "--output", default="result.json", help="Path of the merged JSON result")
+    chunked.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    chunked.add_argument("--warmup", type=int, default=None,
+                         help="Scored frames each chunk analyzes before its range (default: 60)")
+    chunked.set_defaults(func=cmd_chunked)
+
+    stream = sub.add_parser("stream", help="Analyze a live camera or network stream")
+    stream.add_argument("source", help="Device index, stream URL, 'synthetic[:WxH@FPS]' or 'replay:PATH'")
+    stream.add_argument("--latency-ms", type=float, default=None,
+                        help="Skip frames older than this when picked up (default: STREAM_LATENCY_TARGET_MS or 250)")
+    stream.add_argument("-d", "--duration", type=float, default=None, help="Stop after this many seconds")
+    stream.add_argument("-o", "--output", default=None, help="Write the JSON result here")
+    stream.set_defaults(func=cmd_stream)
+
+    bench = sub.add_parser("bench", help="Benchmark the pipeline on generated synthetic videos")
+    bench.add_argument("-o", "--output", default="bench.json", help="Results JSON")
+    bench.add_argument("--quick", action="store_true", help="Two short cases instead of the full matrix")
+    bench.add_argument("--video-dir", default="bench_videos", help="Where generated videos are kept between runs")
+    bench.add_argument("--face-image", default=None,
+                       help="Picture pasted into the videos to exercise FaceMesh (default: the bundled bench_face.jpg)")
+    bench.add_argument("--no-face", action="store_true", help="Benchmark videos without a face")
+    bench.add_argument("--repeat", type=int, default=1, help="Runs per case, the fastest is kept")
+    bench.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                       help="Environment override for the analyzer, e.g. --set FACE_ROI=true")
+    bench.set_defaults(func=cmd_bench)
+
+    compare = sub.add_parser("bench-compare", help="Flag regressions of a benchmark run against a baseline")
+    compare.add_argument("baseline", help="Stored baseline JSON")
+    compare.add_argument("current", help="New results JSON")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown tolerated (default 0.10)")
+    compare.set_defaults(func=cmd_bench_compare)
+
+    serve = sub.add_parser("serve", help="Run a local job server with a warm model pool")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to bind (default: localhost only)")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765)")
+    serve.add_argument("-w", "--workers", type=int, default=2,
+                       help="Concurrent analyses, each with its own warmed-up models (default 2)")
+    serve.add_argument("-v", "--verbose", action="store_true", help="Log every HTTP request")
+    serve.set_defaults(func=cmd_serve)
+
+    submit = sub.add_parser("submit", help="Send a video to a running job server and follow its results")
+    submit.add_argument("video", help="Video file, readable by the server")
+    submit.add_argument("--host", default="127.0.0.1", help="Job server address")
+    submit.add_argument("--port", type=int, default=8765, help="Job server port")
+    submit.add_argument("-p", "--priority", type=int, default=0, help="Higher runs first (default 0)")
+    submit.add_argument("--progress", action="store_true", help="Print progress updates too")
+    submit.add_argument("-o", "--output", default=None, help="Write the JSON result here")
+    submit.set_defaults(func=cmd_submit)
+
+    sweep = sub.add_parser("sweep", help="Re-score cached analyses under a grid of weights and thresholds")
+    sweep.add_argument("videos", nargs="*", help="Only these videos (default: everything in the cache)")
+    sweep.add_argument("--cache-dir", required=True, help="Feature cache written by earlier runs")
+    sweep.add_argument("-g", "--grid", required=True,
+                       help="JSON object mapping rescoring.DEFAULT_CONFIG keys to a value or list of values")
+    sweep.add_argument("-l", "--labels", default=None,
+                       help="JSON object mapping video path or file name to true when the session is cheating")
+    sweep.add_argument("-o", "--output", default=None, help="Write results JSON here instead of stdout")
+    sweep.set_defaults(func=cmd_sweep)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import time
+
+import cv2
+import numpy as np
+
+PROHIBITED_OBJECTS = ["cell phone", "book", "laptop", "paper"]
+
+LAYOUT_DARKNET = "darknet"
+LAYOUT_YOLOV5 = "yolov5"
+LAYOUT_YOLOV8 = "yolov8"
+
+
+def _dnn_constants(names):
+    """Map option names to cv2.dnn constants, skipping ones this OpenCV build lacks"""
+    found = {}
+    for option, constant in names.items():
+        value = getattr(cv2.dnn, constant, None)
+        if value is not None:
+            found[option] = value
+    return found
+
+
+DNN_BACKENDS = _dnn_constants({
+    "default": "DNN_BACKEND_DEFAULT",
+    "opencv": "DNN_BACKEND_OPENCV",
+    "openvino": "DNN_BACKEND_INFERENCE_ENGINE",
+})
+DNN_TARGETS = _dnn_constants({
+    "cpu": "DNN_TARGET_CPU",
+    "cpu_fp16": "DNN_TARGET_CPU_FP16",
+    "opencl": "DNN_TARGET_OPENCL",
+    "opencl_fp16": "DNN_TARGET_OPENCL_FP16",
+})
+
+
+class DetectionResult:
+    """Prohibited objects found in one frame; truthy when anything was found"""
+
+    def __init__(self, boxes=None, class_ids=None, confidences=None, class_names=None):
+        self.boxes = boxes if boxes is not None else np.zeros((0, 4), dtype=np.int32)
+        self.class_ids = class_ids if class_ids is not None else np.zeros(0, dtype=np.int64)
+        self.confidences = confidences if confidences is not None else np.zeros(0, dtype=np.float32)
+        self.class_names = class_names or []
+
+    def __bool__(self):
+        return len(self.class_ids) > 0
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            boxes=np.asarray(data["boxes"], dtype=np.int32).reshape(-1, 4),
+            class_ids=np.asarray(data["class_ids"], dtype=np.int64),
+            confidences=np.asarray(data["confidences"], dtype=np.float32),
+            class_names=data["class_names"]
+        )
+
+    def to_dict(self):
+        return {
+            "boxes": self.boxes.tolist(),
+            "class_ids": self.class_ids.tolist(),
+            "class_names": list(self.class_names),
+            "confidences": [round(float(c), 4) for c in self.confidences],
+        }
+
+
+def prohibited_class_mask(classes, prohibited=PROHIBITED_OBJECTS):
+    """Boolean lookup table over class ids, True for prohibited classes"""
+    return np.array(
+        [any(obj in name.lower() for obj in prohibited) for name in classes],
+        dtype=bool
+    )
+
+
+def decode_yolo_outputs(outputs, frame_shapes, prohibited_mask, classes,
+                        conf_threshold=0.5, nms_threshold=0.4):
+    """Decode darknet-style YOLO outputs for a batch of frames in NumPy.
+
+    Each output layer holds rows of [cx, cy, w, h, objectness, class scores...]
+    for every frame in the batch. Rows are stacked per frame, filtered by
+    objectness (class scores are already scaled by it, so this never drops a
+    row that could pass conf_threshold), and the argmax runs only over the
+    survivors. Returns one DetectionResult per frame.
+    """
+    batch_size = len(frame_shapes)
+    rows = np.concatenate(
+        [np.asarray(out).reshape(batch_size, -1, out.shape[-1]) for out in outputs],
+        axis=1
+    )
+
+    num_scores = rows.shape[-1] - 5
+    lookup = np.zeros(num_scores, dtype=bool)
+    n = min(num_scores, len(prohibited_mask))
+    lookup[:n] = prohibited_mask[:n]
+
+    frame_idx, row_idx = np.nonzero(rows[..., 4] > conf_threshold)
+    candidates = rows[frame_idx, row_idx]
+    class_ids = candidates[:, 5:].argmax(axis=1)
+    confidences = candidates[np.arange(len(candidates)), 5 + class_ids]
+    keep = (confidences > conf_threshold) & lookup[class_ids]
+
+    frame_idx = frame_idx[keep]
+    class_ids = class_ids[keep]
+    confidences = confidences[keep]
+    candidates = candidates[keep]
+
+    results = []
+    for b, shape in enumerate(frame_shapes):
+        sel = frame_idx == b
+        if not sel.any():
+            results.append(DetectionResult())
+            continue
+
+        h, w = shape[:2]
+        cx, cy, bw, bh = (candidates[sel, :4] * np.array([w, h, w, h], dtype=np.float32)).T
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1).astype(np.int32)
+        ids = class_ids[sel]
+        confs = confidences[sel]
+
+        kept = np.asarray(
+            cv2.dnn.NMSBoxes(boxes.tolist(), confs.tolist(), conf_threshold, nms_threshold)
+        ).reshape(-1)
+        results.append(DetectionResult(
+            boxes=boxes[kept],
+            class_ids=ids[kept],
+            confidences=confs[kept],
+            class_names=[classes[i] for i in ids[kept]]
+        ))
+    return results
+
+
+def normalize_onnx_outputs(output, layout, input_size):
+    """Convert an exported YOLOv5/YOLOv8 output into darknet-style rows.
+
+    YOLOv5 gives (batch, boxes, 5 + classes) with raw class scores; YOLOv8
+    gives (batch, 4 + classes, boxes) with no objectness column. Both use
+    input-pixel coordinates. The result is (batch, boxes, 5 + classes) with
+    normalized coordinates and class scores already scaled by objectness,
+    ready for decode_yolo_outputs.
+    """
+    output = np.asarray(output, dtype=np.float32)
+    if layout == LAYOUT_YOLOV8:
+        output = output.transpose(0, 2, 1)
+        boxes, scores = output[..., :4], output[..., 4:]
+        objectness = scores.max(axis=-1, keepdims=True)
+    else:
+        boxes, objectness = output[..., :4], output[..., 4:5]
+        scores = output[..., 5:] * objectness
+    boxes = boxes / np.float32(input_size)
+    return np.concatenate([boxes, objectness, scores], axis=-1)
+
+
+class Detector:
+    """OpenCV DNN object detector behind VideoAnalyzer.detect_objects.
+
+    Wraps a loaded network together with everything needed to run it: the
+    square input size, the output layout (darknet YOLO, or YOLOv5/YOLOv8
+    exported to ONNX) and the largest batch the model accepts (exported
+    ONNX models usually have a fixed batch of 1).
+    """
+
+    def __init__(self, net, classes, name, input_size=416, layout=LAYOUT_DARKNET, max_batch=None,
+                 files=(), backend="default", target="cpu", conf_threshold=0.5, nms_threshold=0.4):
+        self.net = net
+        self.classes = classes
+        self.name = name
+        self.input_size = input_size
+        self.layout = layout
+        self.max_batch = max_batch
+        self.files = files
+        self.backend = backend
+        self.target = target
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.prohibited_mask = prohibited_class_mask(classes)
+        self._output_names = net.getUnconnectedOutLayersNames()
+
+    def detect_batch(self, frames):
+        """Run the network over frames, returns one DetectionResult per frame"""
+        results = []
+        step = self.max_batch or len(frames)
+        size = (self.input_size, self.input_size)
+        for start in range(0, len(frames), step):
+            chunk = frames[start:start + step]
+            blob = cv2.dnn.blobFromImages(chunk, 1/255, size, swapRB=True)
+            self.net.setInput(blob)
+            outputs = self.net.forward(self._output_names)
+            if self.layout != LAYOUT_DARKNET:
+                outputs = [normalize_onnx_outputs(outputs[0], self.layout, self.input_size)]
+            results.extend(decode_yolo_outputs(
+                outputs, [frame.shape for frame in chunk], self.prohibited_mask, self.classes,
+                self.conf_threshold, self.nms_threshold
+            ))
+        return results
+
+    def measure_latency(self, runs=5, frame_size=(640, 480)):
+        """Median seconds per single-frame detection, after one untimed warm-up run"""
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, size=(frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        self.detect_batch([frame])
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            self.detect_batch([frame])
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
+
+    def describe(self):
+        """Everything that changes the detector's outputs, for records and cache keys"""
+        return {
+            "name": self.name,
+            "input_size": self.input_size,
+            "layout": self.layout,
+            "backend": self.backend,
+            "target": self.target,
+            "files": [list(f) for f in self.files],
+        }
+
+
+class DetectionScheduler:
+    """Decides which sampled frames get a fresh object-detection pass.
+
+    The detector runs every base_interval sampled frames, and immediately
+    whenever a small grayscale thumbnail of the frame differs from the one
+    taken at the last detection, either by mean absolute pixel difference or
+    by histogram distance. Frames in between reuse the last result.
+    """
+
+    def __init__(self, base_interval, diff_threshold=10.0, hist_threshold=0.2, thumb_size=(64, 36)):
+        self.base_interval = base_interval
+        self.diff_threshold = diff_threshold
+        self.hist_threshold = hist_threshold
+        self.thumb_size = thumb_size
+        self.invocations = 0
+        self.saved = 0
+        self.scene_changes = 0
+        self._reference = None
+        self._reference_hist = None
+        self._since_last = 0
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+        hist = cv2.calcHist([thumb], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+        return thumb, hist
+
+    def needs_detection(self, frame):
+        thumb, hist = self._thumbnail(frame)
+        due = self._reference is None or self._since_last + 1 >= self.base_interval
+        if not due:
+            diff = cv2.absdiff(thumb, self._reference).mean()
+            distance = cv2.compareHist(hist, self._reference_hist, cv2.HISTCMP_BHATTACHARYYA)
+            if diff > self.diff_threshold or distance > self.hist_threshold:
+                self.scene_changes += 1
+                due = True
+
+        if due:
+            self._reference, self._reference_hist = thumb, hist
+            self._since_last = 0
+            self.invocations += 1
+            return True
+        self._since_last += 1
+        self.saved += 1
+        return False
+
+    def stats(self):
+        return {
+            "invocations": self.invocations,
+            "saved": self.saved,
+            "scene_changes": self.scene_changes,
+        }
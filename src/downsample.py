@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class MinMaxDownsampler:
+    """Incremental per-pixel-column min/max reduction of growing series.
+
+    The x range is split into n_bins equal columns (one per screen pixel).
+    Each column is drawn as its min and max, which is visually identical to
+    plotting every sample but needs at most 2 * n_bins points. x must be
+    non-decreasing; columns left of the newest sample are reduced once and
+    cached, so each update only touches the samples added since the last one.
+    """
+
+    def __init__(self, x_min=0.0, x_max=1.0, n_bins=500):
+        self.reset(x_min, x_max, n_bins)
+
+    def reset(self, x_min, x_max, n_bins):
+        self.x_min = x_min
+        self.n_bins = max(1, int(n_bins))
+        self.bin_width = (x_max - x_min) / self.n_bins or 1.0
+        self._consumed = 0
+        self._done_x = []
+        self._done_ys = None
+
+    def _reduce(self, x, ys):
+        bins = np.floor((x - self.x_min) / self.bin_width).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        left = self.x_min + bins[starts] * self.bin_width
+        out_x = np.column_stack([left, left + self.bin_width / 2]).ravel()
+        out_ys = [
+            np.column_stack([np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)]).ravel()
+            for y in ys
+        ]
+        return out_x, out_ys, starts
+
+    def update(self, x, *ys):
+        """Return (x, [y...]) ready for Line2D.set_data, reusing reduced columns"""
+        if len(x) <= 2 * self.n_bins:
+            return x, list(ys)
+
+        if self._done_ys is None:
+            self._done_ys = [[] for _ in ys]
+
+        new_x = x[self._consumed:]
+        new_ys = [y[self._consumed:] for y in ys]
+        out_x, out_ys, starts = self._reduce(new_x, new_ys)
+
+        # Every column but the last is complete and will never change again
+        if len(starts) > 1:
+            self._done_x.append(out_x[:-2])
+            for done, y in zip(self._done_ys, out_ys):
+                done.append(y[:-2])
+            self._consumed += int(starts[-1])
+            self._done_x = [np.concatenate(self._done_x)]
+            self._done_ys = [[np.concatenate(done)] for done in self._done_ys]
+
+        x_out = np.concatenate(self._done_x + [out_x[-2:]])
+        y_out = [np.concatenate(done + [y[-2:]]) for done, y in zip(self._done_ys, out_ys)]
+        return x_out, y_out
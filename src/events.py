@@ -0,0 +1,219 @@
+import bisect
+import threading
+
+EVENT_OBJECT = "forbidden_object"
+EVENT_HIGH_PROBABILITY = "high_probability"
+EVENT_GAZE_LEFT = "gaze_left"
+EVENT_GAZE_RIGHT = "gaze_right"
+
+EVENT_LABELS = {
+    EVENT_OBJECT: "Forbidden object detected",
+    EVENT_HIGH_PROBABILITY: "High cheating probability",
+    EVENT_GAZE_LEFT: "Suspicious gaze: LEFT",
+    EVENT_GAZE_RIGHT: "Suspicious gaze: RIGHT",
+}
+
+DEFAULT_FPS = 30.0
+
+
+class EventRecord:
+    """One flagged interval: consecutive sampled frames with the same event type"""
+
+    __slots__ = ("type", "start_frame", "end_frame", "peak", "count")
+
+    def __init__(self, type, start_frame, end_frame=None, peak=None, count=1):
+        self.type = type
+        self.start_frame = start_frame
+        self.end_frame = start_frame if end_frame is None else end_frame
+        self.peak = peak
+        self.count = count
+
+    def extend(self, frame, value=None):
+        self.end_frame = frame
+        self.count += 1
+        if value is not None and (self.peak is None or value > self.peak):
+            self.peak = value
+
+    def format(self, fps):
+        fps = fps or DEFAULT_FPS
+        label = EVENT_LABELS.get(self.type, self.type)
+        if self.type == EVENT_HIGH_PROBABILITY and self.peak is not None:
+            label = f"{label}: {self.peak:.2f}%"
+        elif self.type == EVENT_OBJECT and self.peak is not None:
+            label = f"{label} (confidence {self.peak:.2f})"
+        start = round(self.start_frame / fps, 2)
+        if self.end_frame == self.start_frame:
+            return f"Time: {start}s - {label}\n"
+        end = round(self.end_frame / fps, 2)
+        return f"Time: {start}s-{end}s - {label} ({self.count} frames)\n"
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "start_frame": self.start_frame,
+            "end_frame": self.end_frame,
+            "peak": self.peak,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["type"], data["start_frame"], data["end_frame"], data["peak"], data["count"])
+
+
+class EventLog:
+    """Coalesces per-frame observations into intervals and indexes them by time.
+
+    An observation extends the open interval of its type when it comes
+    within max_gap frames of that interval's end, otherwise it closes it
+    and opens a new one. Records are kept in start order, with a running
+    maximum of end frames, so overlap queries are a bisect plus a short
+    backwards scan. An interval also closes once the analysis has moved
+    more than max_gap frames past its end (see tick()). Closed intervals
+    are queued for the UI, which picks them up in batches with
+    drain_pending().
+    """
+
+    def __init__(self, fps=None, max_gap=8):
+        self.fps = fps
+        self.max_gap = max_gap
+        self._lock = threading.Lock()
+        self._records = []
+        self._starts = []
+        self._max_end = []
+        self._dirty_from = 0
+        self._open = {}
+        self._pending = []
+
+    def __len__(self):
+        return len(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._starts.clear()
+            self._max_end.clear()
+            self._dirty_from = 0
+            self._open.clear()
+            self._pending.clear()
+
+    def observe(self, event_type, frame, value=None):
+        """Record that event_type was flagged on this sampled frame"""
+        with self._lock:
+            self._close_stale(frame)
+            index = self._open.get(event_type)
+            if index is not None:
+                record = self._records[index]
+                if frame - record.end_frame <= self.max_gap:
+                    record.extend(frame, value)
+                    self._dirty_from = min(self._dirty_from, index)
+                    return
+                self._pending.append(record)
+            self._open[event_type] = len(self._records)
+            self._add(EventRecord(event_type, frame, peak=value))
+
+    def tick(self, frame):
+        """Close every interval that frame has left more than max_gap behind"""
+        with self._lock:
+            self._close_stale(frame)
+
+    def _close_stale(self, frame):
+        stale = [
+            (index, event_type) for event_type, index in self._open.items()
+            if frame - self._records[index].end_frame > self.max_gap
+        ]
+        for index, event_type in sorted(stale):
+            self._pending.append(self._records[index])
+            del self._open[event_type]
+
+    def close_all(self):
+        """Close every open interval, e.g. at the end of an analysis"""
+        with self._lock:
+            for index in sorted(self._open.values()):
+                self._pending.append(self._records[index])
+            self._open.clear()
+
+    def add_record(self, record, open=False):
+        """Append an existing interval; records must arrive in start order.
+
+        With open set the interval is reopened, so later observations of its
+        type can still extend it (used to resume a stored session).
+        """
+        with self._lock:
+            if open:
+                self._open[record.type] = len(self._records)
+            self._add(record)
+
+    def open_indices(self):
+        """Positions in records() of the intervals that are still open"""
+        with self._lock:
+            return list(self._open.values())
+
+    def _add(self, record):
+        self._records.append(record)
+        self._starts.append(record.start_frame)
+        self._max_end.append(record.end_frame)
+        self._dirty_from = min(self._dirty_from, len(self._records) - 1)
+
+    def _refresh_index(self):
+        running = self._max_end[self._dirty_from - 1] if self._dirty_from > 0 else float("-inf")
+        for i in range(self._dirty_from, len(self._records)):
+            running = max(running, self._records[i].end_frame)
+            self._max_end[i] = running
+        self._dirty_from = len(self._records)
+
+    def drain_pending(self):
+        """Return the intervals closed since the last call"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def records_from(self, index):
+        """Intervals at positions index and later of records()"""
+        with self._lock:
+            return self._records[index:]
+
+    def between_frames(self, first, last):
+        """Every interval overlapping frames [first, last], in start order"""
+        with self._lock:
+            self._refresh_index()
+            i = bisect.bisect_right(self._starts, last) - 1
+            found = []
+            while i >= 0 and self._max_end[i] >= first:
+                if self._records[i].end_frame >= first:
+                    found.append(self._records[i])
+                i -= 1
+        return found[::-1]
+
+    def between(self, t1, t2):
+        """Every interval overlapping the time range [t1, t2] in seconds"""
+        fps = self.fps or DEFAULT_FPS
+        return self.between_frames(t1 * fps, t2 * fps)
+
+    def formatted(self):
+        return [record.format(self.fps) for record in self.records()]
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self.records()]
+
+
+def merge_records(records, max_gap):
+    """Coalesce records of the same type that touch across a boundary, e.g. chunk seams"""
+    merged = []
+    last_of_type = {}
+    for record in sorted(records, key=lambda r: r.start_frame):
+        previous = last_of_type.get(record.type)
+        if previous is not None and record.start_frame - previous.end_frame <= max_gap:
+            previous.end_frame = max(previous.end_frame, record.end_frame)
+            previous.count += record.count
+            if record.peak is not None and (previous.peak is None or record.peak > previous.peak):
+                previous.peak = record.peak
+            continue
+        copy = EventRecord(record.type, record.start_frame, record.end_frame, record.peak, record.count)
+        merged.append(copy)
+        last_of_type[record.type] = copy
+    return merged
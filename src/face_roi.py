@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+from features import landmarks_to_array
+
+
+class FaceRoiTracker:
+    """Runs FaceMesh on a downscaled frame to find the face, then on a crop.
+
+    Once a face is found, later frames only send a padded crop around it to
+    FaceMesh. The crop is re-centered when the face drifts towards its
+    edge, and the tracker falls back to a downscaled full-frame search when
+    the face is lost, touches the crop border or changes size abruptly.
+    Landmarks are always returned in full-frame normalized coordinates, so
+    downstream features don't know which path produced them.
+    """
+
+    def __init__(self, face_mesh, search_width=640, padding=0.6, recenter_margin=0.1, max_scale_change=0.35):
+        self.face_mesh = face_mesh
+        self.search_width = search_width
+        self.padding = padding
+        self.recenter_margin = recenter_margin
+        self.max_scale_change = max_scale_change
+        self.roi = None
+        self.face_box = None
+        self.full_searches = 0
+        self.crop_hits = 0
+
+    def reset(self):
+        self.roi = None
+        self.face_box = None
+
+    def _run(self, image_bgr):
+        results = self.face_mesh.process(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return []
+        return [landmarks_to_array(face) for face in results.multi_face_landmarks]
+
+    def _search(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.search_width:
+            scale = self.search_width / w
+            frame = cv2.resize(frame, (self.search_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        # A plain resize keeps normalized coordinates unchanged
+        return self._run(frame)
+
+    def _crop_roi(self, box, frame_shape):
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        size = max(x1 - x0, y1 - y0) * (1 + 2 * self.padding)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        return (
+            int(max(0, cx - size / 2)), int(max(0, cy - size / 2)),
+            int(min(w, cx + size / 2)), int(min(h, cy + size / 2)),
+        )
+
+    def _needs_recenter(self, box):
+        rx0, ry0, rx1, ry1 = self.roi
+        mx = (rx1 - rx0) * self.recenter_margin
+        my = (ry1 - ry0) * self.recenter_margin
+        x0, y0, x1, y1 = box
+        return x0 < rx0 + mx or y0 < ry0 + my or x1 > rx1 - mx or y1 > ry1 - my
+
+    def _lost_track(self, box):
+        """Cheap confidence check on a crop result"""
+        rx0, ry0, rx1, ry1 = self.roi
+        x0, y0, x1, y1 = box
+        if x0 <= rx0 + 1 or y0 <= ry0 + 1 or x1 >= rx1 - 1 or y1 >= ry1 - 1:
+            return True
+        if self.face_box is not None:
+            previous = self.face_box[2] - self.face_box[0]
+            if previous > 0 and abs((x1 - x0) - previous) / previous > self.max_scale_change:
+                return True
+        return False
+
+    def process(self, frame):
+        """Return a list of (N, 3) landmark arrays in full-frame normalized coordinates"""
+        h, w = frame.shape[:2]
+
+        if self.roi is not None:
+            faces = self._track(frame)
+            if faces is None:
+                # FaceMesh only re-detects on the frame after it loses a
+                # track, so give the crop one more try from a clean state
+                self.face_mesh.reset()
+                faces = self._track(frame)
+            if faces is not None:
+                return faces
+            # Tracking state refers to the crop; start the search from scratch
+            self.reset()
+            self.face_mesh.reset()
+
+        self.full_searches += 1
+        faces = self._search(frame)
+        if faces:
+            self.face_box = self._pixel_box(faces[0], w, h)
+            self.roi = self._crop_roi(self.face_box, frame.shape)
+            self.face_mesh.reset()
+        return faces
+
+    def _track(self, frame):
+        """Process the crop around the last face; None when the track is lost"""
+        h, w = frame.shape[:2]
+        rx0, ry0, rx1, ry1 = self.roi
+        faces = self._run(frame[ry0:ry1, rx0:rx1])
+        if not faces:
+            return None
+
+        cw, ch = rx1 - rx0, ry1 - ry0
+        scale = np.array([cw / w, ch / h, cw / w], dtype=np.float32)
+        offset = np.array([rx0 / w, ry0 / h, 0], dtype=np.float32)
+        faces = [face * scale + offset for face in faces]
+        box = self._pixel_box(faces[0], w, h)
+        if self._lost_track(box):
+            return None
+
+        self.crop_hits += 1
+        self.face_box = box
+        if self._needs_recenter(box):
+            self.roi = self._crop_roi(box, frame.shape)
+        return faces
+
+    @staticmethod
+    def _pixel_box(landmarks, w, h):
+        x = landmarks[:, 0] * w
+        y = landmarks[:, 1] * h
+        return float(x.min()), float(y.min()), float(x.max()), float(y.max())
+
+    def stats(self):
+        return {"full_searches": self.full_searches, "crop_hits": self.crop_hits}
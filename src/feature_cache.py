@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+ARRAY_NAMES = ("frame_numbers", "has_face", "object_detected", "landmarks", "features")
+FEATURE_COLUMNS = ("eye_tracking", "head_movement", "mouth_movement", "gaze_x")
+# Rows a recorded array grows by at a time; the header is written for
+# MAX_ROWS so its length does not change when the real count is filled in
+GROW_ROWS = 1024
+MAX_ROWS = 10 ** 12
+# Scratch files untouched for this long belong to a run that crashed or was
+# killed, and are removed by evict()
+STALE_TMP_SECONDS = 24 * 3600
+
+
+def content_hash(path):
+    """SHA-256 of the file contents, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GrowingArray:
+    """An .npy file whose first axis grows by chunk_rows at a time.
+
+    Rows are written through a memory map of the file, so they live in the
+    page cache rather than the Python heap, and growing only extends the
+    file. The header is sized for any row count up front and rewritten
+    with the real shape by finish(), which leaves a regular .npy file.
+    """
+
+    def __init__(self, path, row_shape, dtype=np.float32, chunk_rows=GROW_ROWS):
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.size = 0
+        self._capacity = 0
+        self._map = None
+        self._row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+        self._file = open(path, "w+b")
+        self._offset = self._write_header(MAX_ROWS)
+
+    def _write_header(self, rows):
+        self._file.seek(0)
+        np.lib.format.write_array_header_1_0(self._file, {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (rows,) + self.row_shape,
+        })
+        return self._file.tell()
+
+    def append(self, row):
+        if self.size == self._capacity:
+            self._grow()
+        self._map[self.size] = row
+        self.size += 1
+
+    def _grow(self):
+        self._capacity += self.chunk_rows
+        if self._map is not None:
+            self._map.flush()
+        self._file.truncate(self._offset + self._capacity * self._row_bytes)
+        if self._row_bytes:
+            self._map = np.memmap(
+                self._file, dtype=self.dtype, mode="r+", offset=self._offset,
+                shape=(self._capacity,) + self.row_shape
+            )
+
+    def finish(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._file.truncate(self._offset + self.size * self._row_bytes)
+        if self._write_header(self.size) != self._offset:
+            raise ValueError(f"Header of {self.path} changed size")
+        self._file.close()
+
+    def close(self):
+        self._map = None
+        self._file.close()
+
+
+class FeatureRecorder:
+    """Collects the raw per-sampled-frame outputs of one analysis for caching.
+
+    Landmarks and features go straight into GrowingArray files in directory
+    (a scratch directory inside the cache, see FeatureCache.recorder), so a
+    long session does not hold them in memory and storing the entry is a
+    rename. The small per-frame flags are kept in lists until finish().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.frame_numbers = []
+        self.has_face = []
+        self.object_detected = []
+        self.landmarks = None
+        self.features = GrowingArray(os.path.join(directory, "features.npy"), (len(FEATURE_COLUMNS),))
+
+    def record(self, frame_number, landmarks, frame_features, object_detected):
+        self.frame_numbers.append(frame_number)
+        self.object_detected.append(bool(object_detected))
+        self.has_face.append(landmarks is not None)
+        if landmarks is not None:
+            if self.landmarks is None:
+                self.landmarks = GrowingArray(os.path.join(self.directory, "landmarks.npy"), landmarks.shape)
+            self.landmarks.append(landmarks)
+            self.features.append([frame_features[name] for name in FEATURE_COLUMNS])
+
+    def finish(self):
+        """Write the remaining arrays and return the directory holding all of them"""
+        if self.landmarks is None:
+            np.save(os.path.join(self.directory, "landmarks.npy"), np.zeros((0, 0, 3), dtype=np.float32))
+        else:
+            self.landmarks.finish()
+        self.features.finish()
+        np.save(os.path.join(self.directory, "frame_numbers.npy"), np.asarray(self.frame_numbers, dtype=np.int64))
+        np.save(os.path.join(self.directory, "has_face.npy"), np.asarray(self.has_face, dtype=bool))
+        np.save(os.path.join(self.directory, "object_detected.npy"),
+                np.asarray(self.object_detected, dtype=bool))
+        return self.directory
+
+    def discard(self):
+        """Drop everything recorded, e.g. when the analysis did not finish"""
+        for array in (self.landmarks, self.features):
+            if array is not None:
+                array.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CacheEntry:
+    """A cached analysis: memory-mapped arrays plus the JSON metadata"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ARRAY_NAMES
+        }
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+class FeatureCache:
+    """On-disk cache of per-frame analysis outputs with size-based LRU eviction.
+
+    Entries are keyed by the video's content hash plus every setting that
+    changes the raw outputs (sampling, models, inference modes). Each entry
+    is a directory of .npy files that load memory-mapped, so a hit costs
+    little more than opening a handful of files. Access time is tracked via
+    the entry's mtime, and the least recently used entries are evicted once
+    the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, "hash_index.json")
+
+    def video_hash(self, video_path):
+        """Content hash, memoized on (path, size, mtime) so unchanged files aren't re-read"""
+        stat = os.stat(video_path)
+        memo_key = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self._lock:
+            index = self._load_hash_index()
+            if memo_key in index:
+                return index[memo_key]
+        digest = content_hash(video_path)
+        with self._lock:
+            index = self._load_hash_index()
+            index[memo_key] = digest
+            self._write_json(self._hash_index_path, index)
+        return digest
+
+    def key(self, video_path, settings):
+        payload = json.dumps(
+            {"video": self.video_hash(video_path), "settings": settings, "version": CACHE_VERSION},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def load(self, key):
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        try:
+            entry = CacheEntry(path)
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {key}: {str(e)}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(path)
+        return entry
+
+    def recorder(self):
+        """A FeatureRecorder writing into a scratch directory of this cache"""
+        return FeatureRecorder(tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir))
+
+    def store(self, key, recorder, meta):
+        """Turn a recorder's scratch directory into the entry for key"""
+        tmp_dir = recorder.directory
+        try:
+            recorder.finish()
+            self._write_json(os.path.join(tmp_dir, "meta.json"), meta)
+            final_dir = os.path.join(self.cache_dir, key)
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(tmp_dir, final_dir)
+        except Exception:
+            recorder.discard()
+            raise
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) for every complete entry, least recently used first"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+            )
+            result.append((os.path.getmtime(path), size, path))
+        return sorted(result)
+
+    def evict(self):
+        """Drop stale scratch files, then least recently used entries until under max_bytes"""
+        with self._lock:
+            self._remove_stale_tmp()
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            evicted = []
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                evicted.append(self._entry_video_hash(path))
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+            if evicted:
+                self._prune_hash_index(set(evicted))
+
+    def _remove_stale_tmp(self):
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for name in os.listdir(self.cache_dir):
+            if not name.startswith(".tmp-"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.isdir(path):
+                    # Growing files update their own mtime, not the directory's
+                    touched = max(
+                        [os.path.getmtime(path)]
+                        + [os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)]
+                    )
+                    if touched < cutoff:
+                        shutil.rmtree(path, ignore_errors=True)
+                elif os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _entry_video_hash(path):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f).get("video_hash")
+        except (OSError, ValueError):
+            return None
+
+    def _prune_hash_index(self, digests):
+        """Forget memoized hashes of videos that no longer have any entry"""
+        digests -= {self._entry_video_hash(path) for _, _, path in self.entries()}
+        digests.discard(None)
+        if not digests:
+            return
+        index = self._load_hash_index()
+        kept = {memo_key: digest for memo_key, digest in index.items() if digest not in digests}
+        if len(kept) != len(index):
+            self._write_json(self._hash_index_path, kept)
+
+    def _load_hash_index(self):
+        try:
+            with open(self._hash_index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_json(path, data):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,77 @@
+import numpy as np
+
+NUM_LANDMARKS = 478
+
+NOSE_TIP = 1
+LEFT_EYE_OUTER = 33
+LEFT_EYE_INNER = 133
+RIGHT_EYE_INNER = 362
+RIGHT_EYE_OUTER = 263
+UPPER_LIP = 13
+LOWER_LIP = 14
+FACE_LEFT = 234
+FACE_RIGHT = 454
+
+GAZE_LEFT = 0.4
+GAZE_RIGHT = 0.6
+
+
+def landmarks_to_array(face_landmarks):
+    """Convert a FaceMesh NormalizedLandmarkList into an (N, 3) float32 array"""
+    return np.array(
+        [(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def as_landmark_array(landmarks):
+    if isinstance(landmarks, np.ndarray):
+        return landmarks
+    return landmarks_to_array(landmarks)
+
+
+def face_width(lm):
+    return np.abs(lm[..., FACE_RIGHT, 0] - lm[..., FACE_LEFT, 0])
+
+
+def eye_tracking(lm, width=None):
+    width = face_width(lm) if width is None else width
+    return np.abs(lm[..., LEFT_EYE_OUTER, 0] - lm[..., RIGHT_EYE_OUTER, 0]) / width * 100
+
+
+def head_movement(lm, width=None):
+    width = face_width(lm) if width is None else width
+    return np.abs(lm[..., NOSE_TIP, 0] - 0.5) / width * 200
+
+
+def mouth_movement(lm):
+    return np.abs(lm[..., UPPER_LIP, 1] - lm[..., LOWER_LIP, 1]) * 100
+
+
+def gaze_x(lm):
+    left_eye_h = (lm[..., LEFT_EYE_OUTER, 0] + lm[..., LEFT_EYE_INNER, 0]) / 2
+    right_eye_h = (lm[..., RIGHT_EYE_INNER, 0] + lm[..., RIGHT_EYE_OUTER, 0]) / 2
+    return (left_eye_h + right_eye_h) / 2
+
+
+def gaze_direction(gx):
+    """Map horizontal gaze positions to LEFT/CENTER/RIGHT labels"""
+    return np.where(gx < GAZE_LEFT, "LEFT", np.where(gx > GAZE_RIGHT, "RIGHT", "CENTER"))
+
+
+def compute_features(lm):
+    """Compute every per-frame feature from landmarks shaped (..., N, 3).
+
+    Works the same on a single (478, 3) frame and on a stacked
+    (frames, 478, 3) array, where each value becomes a per-frame vector.
+    """
+    width = face_width(lm)
+    values = {
+        "eye_tracking": eye_tracking(lm, width),
+        "head_movement": head_movement(lm, width),
+        "mouth_movement": mouth_movement(lm),
+        "gaze_x": gaze_x(lm),
+    }
+    # NumPy promotes 0-d results to float64; keep single frames and stacked
+    # arrays bit-identical so cached features re-score exactly
+    return {name: np.asarray(value, dtype=np.float32) for name, value in values.items()}
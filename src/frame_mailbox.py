@@ -0,0 +1,80 @@
+import threading
+
+import cv2
+
+
+def fit_size(frame_width, frame_height, canvas_width, canvas_height):
+    """Largest size with the frame's aspect ratio that fits inside the canvas"""
+    aspect_ratio = frame_width / frame_height
+    if canvas_width / canvas_height > aspect_ratio:
+        new_height = canvas_height
+        new_width = int(new_height * aspect_ratio)
+    else:
+        new_width = canvas_width
+        new_height = int(new_width / aspect_ratio)
+    return max(1, new_width), max(1, new_height)
+
+
+class FrameMailbox:
+    """Single-slot handoff of the latest display frame from a worker to the UI.
+
+    put() never blocks: it overwrites whatever the UI has not picked up yet
+    and counts it as dropped. Frames are resized to the canvas and converted
+    to RGB on the worker side, so the UI thread only wraps them for Tk. The
+    fitted size is recomputed only when the canvas or the source size changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._taken_seq = 0
+        self.dropped = 0
+        self._canvas_size = None
+        self._source_shape = None
+        self._target_size = None
+
+    def set_canvas_size(self, width, height):
+        with self._lock:
+            if width > 1 and height > 1 and (width, height) != self._canvas_size:
+                self._canvas_size = (width, height)
+                self._target_size = None
+
+    def _prepare(self, frame):
+        with self._lock:
+            if self._canvas_size is None:
+                return None
+            if self._target_size is None or frame.shape[:2] != self._source_shape:
+                self._source_shape = frame.shape[:2]
+                frame_height, frame_width = self._source_shape
+                self._target_size = fit_size(frame_width, frame_height, *self._canvas_size)
+            target_size = self._target_size
+        frame = cv2.resize(frame, target_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def put(self, frame):
+        """Publish a BGR frame for display, replacing any frame not yet shown"""
+        if frame is None:
+            return
+        prepared = self._prepare(frame)
+        if prepared is None:
+            return
+        with self._lock:
+            if self._seq != self._taken_seq:
+                self.dropped += 1
+            self._frame = prepared
+            self._seq += 1
+
+    def take(self):
+        """Return the newest RGB frame if one arrived since the last take, else None"""
+        with self._lock:
+            if self._seq == self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            return self._frame
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._taken_seq = self._seq
+            self.dropped = 0
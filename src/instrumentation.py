@@ -0,0 +1,344 @@
+import bisect
+import cProfile
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+STAGES = ("decode", "color_convert", "face_mesh", "yolo", "features_scoring", "overlay", "callbacks")
+
+# Upper bounds in seconds, Prometheus "le" style; the last bucket is +Inf
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROLLING_WINDOW = 60.0
+ROLLING_SLOTS = 6
+EXPORT_INTERVAL = 5.0
+SAMPLING_INTERVAL = 0.005
+
+
+def _stage_order(name):
+    return STAGES.index(name) if name in STAGES else len(STAGES)
+
+
+class StageTimer:
+    """Accumulates wall time and call counts per pipeline stage.
+
+    Stages can be timed from several threads at once (decode runs on the
+    reader thread), so totals are updated under a lock. Counters and gauges
+    hold frame-level figures such as processed/dropped frames and queue depth.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+        self.counts = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {
+                    "total_s": round(self.totals[name], 6),
+                    "count": self.counts[name],
+                    "mean_ms": round(self.totals[name] / self.counts[name] * 1000, 4),
+                }
+                for name in sorted(self.totals, key=_stage_order)
+            }
+
+
+class RollingHistogram:
+    """Latency histogram with lifetime totals plus a rolling window.
+
+    Lifetime bucket counts feed Prometheus, which wants monotonic counters.
+    The window is a ring of time slots that are zeroed as they come round
+    again, so rolling quantiles cost a sum over a handful of small arrays.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS, window=ROLLING_WINDOW, slots=ROLLING_SLOTS):
+        self.buckets = tuple(buckets)
+        self.counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.slot_seconds = window / slots
+        self._slots = np.zeros((slots, len(self.buckets) + 1), dtype=np.int64)
+        self._slot_ids = [-1] * slots
+
+    def _slot(self, now):
+        slot_id = int(now / self.slot_seconds)
+        index = slot_id % len(self._slot_ids)
+        if self._slot_ids[index] != slot_id:
+            self._slots[index] = 0
+            self._slot_ids[index] = slot_id
+        return index
+
+    def observe(self, value, now=None):
+        bucket = bisect.bisect_left(self.buckets, value)
+        self.counts[bucket] += 1
+        self.sum += value
+        self._slots[self._slot(time.monotonic() if now is None else now), bucket] += 1
+
+    def rolling_counts(self, now=None):
+        current = int((time.monotonic() if now is None else now) / self.slot_seconds)
+        live = [i for i, slot_id in enumerate(self._slot_ids) if current - slot_id < len(self._slot_ids)]
+        return self._slots[live].sum(axis=0)
+
+    def quantile(self, q, counts=None):
+        """Upper bound of the bucket holding quantile q (None when empty)"""
+        counts = self.rolling_counts() if counts is None else counts
+        total = counts.sum()
+        if total == 0:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(counts), q * total))
+        return self.buckets[bucket] if bucket < len(self.buckets) else float("inf")
+
+
+class PipelineMetrics(StageTimer):
+    """StageTimer that also keeps per-stage latency histograms and a rolling FPS.
+
+    snapshot() is the JSON view; prometheus_text() renders the same data in
+    the Prometheus text exposition format.
+    """
+
+    def __init__(self, window=ROLLING_WINDOW):
+        super().__init__()
+        self.window = window
+        self.histograms = {}
+        self.started = time.monotonic()
+        self._frames = RollingHistogram(buckets=(), window=window)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram(window=self.window)
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if name == "frames_processed":
+                self._frames.observe(0.0)
+
+    def effective_fps(self):
+        """Processed frames per second over the rolling window"""
+        with self._lock:
+            frames = int(self._frames.rolling_counts().sum())
+        span = min(self.window, time.monotonic() - self.started)
+        return frames / span if span > 0 else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            stages = {}
+            for name in sorted(self.histograms, key=_stage_order):
+                histogram = self.histograms[name]
+                rolling = histogram.rolling_counts()
+                stages[name] = {
+                    "count": self.counts[name],
+                    "total_s": round(self.totals[name], 6),
+                    "mean_ms": round(self.totals[name] / self.counts[name] * 1000, 4),
+                    "window_count": int(rolling.sum()),
+                    "p50_le_s": histogram.quantile(0.5, rolling),
+                    "p95_le_s": histogram.quantile(0.95, rolling),
+                    "p99_le_s": histogram.quantile(0.99, rolling),
+                }
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "timestamp": time.time(),
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "effective_fps": round(self.effective_fps(), 3),
+            "stages": stages,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def prometheus_text(self, prefix="proctoring"):
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per pipeline stage call",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self.histograms, key=_stage_order):
+                histogram = self.histograms[name]
+                cumulative = np.cumsum(histogram.counts)
+                for bound, count in zip(histogram.buckets, cumulative):
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {cumulative[-1]}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {cumulative[-1]}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+        lines.append(f"# TYPE {prefix}_effective_fps gauge")
+        lines.append(f"{prefix}_effective_fps {self.effective_fps():.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter(threading.Thread):
+    """Rewrites a Prometheus text file and/or JSON snapshot every interval seconds.
+
+    Files are replaced atomically, so a node_exporter textfile collector or
+    a tailing script never sees a half-written file. "{pid}" in a path is
+    replaced by the process id, giving each batch worker its own file.
+    """
+
+    def __init__(self, metrics, prometheus_path=None, json_path=None, interval=EXPORT_INTERVAL):
+        super().__init__(daemon=True)
+        pid = str(os.getpid())
+        self.metrics = metrics
+        self.prometheus_path = prometheus_path.replace("{pid}", pid) if prometheus_path else None
+        self.json_path = json_path.replace("{pid}", pid) if json_path else None
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            if self.prometheus_path:
+                _write_atomic(self.prometheus_path, self.metrics.prometheus_text())
+            if self.json_path:
+                _write_atomic(self.json_path, json.dumps(self.metrics.snapshot()))
+        except Exception as e:
+            print(f"Metrics export failed: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.write()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_metrics(prometheus_path=None, json_path=None, interval=EXPORT_INTERVAL):
+    """The process-wide PipelineMetrics, with its MetricsExporter started on first call.
+
+    Every analyzer in a process (pooled sessions, job server workers) records
+    into the same metrics, so exported counters stay monotonic across
+    analyses and a single exporter thread writes the files. The paths and
+    interval of the first call win.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            metrics = PipelineMetrics()
+            exporter = MetricsExporter(metrics, prometheus_path, json_path, interval)
+            exporter.start()
+            _shared = (metrics, exporter)
+        return _shared
+
+
+def current_shared_metrics():
+    """The process-wide PipelineMetrics, or None when instrumentation is off"""
+    return _shared[0] if _shared is not None else None
+
+
+class SamplingProfiler(threading.Thread):
+    """Samples one thread's Python stack every interval seconds.
+
+    Much cheaper than cProfile on tight loops since the profiled thread is
+    not traced at all. write() emits collapsed stacks ("a;b;c count"), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLING_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path):
+        _write_atomic(path, "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+
+@contextmanager
+def _profiled(mode, path):
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            profiler.dump_stats(path + ".prof")
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            profiler.write(path + ".folded")
+
+
+def profile_session(mode, profile_dir, name):
+    """Profile the calling thread for the duration of a with-block.
+
+    mode is "cprofile" (deterministic, written as <name>-<time>.prof for
+    pstats/snakeviz) or "sampling" (SamplingProfiler, written as .folded);
+    anything else disables profiling.
+    """
+    if mode not in ("cprofile", "sampling"):
+        return nullcontext()
+    stem = os.path.splitext(os.path.basename(name or "session"))[0]
+    path = os.path.join(profile_dir, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}")
+    return _profiled(mode, path)
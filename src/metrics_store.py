@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+
+METRIC_COLUMNS = ("time", "eye_tracking", "head_movement", "mouth_movement", "cheating_probability")
+
+
+class MetricStore:
+    """Columnar per-frame metric series backed by preallocated NumPy arrays.
+
+    Every column is a float32 array that doubles in capacity when full, so
+    appends are amortized O(1) and a row costs 4 bytes per column. view()
+    returns a zero-copy slice of the rows written so far; a view taken before
+    a resize keeps pointing at the old buffer, which stays valid.
+    """
+
+    def __init__(self, columns=METRIC_COLUMNS, capacity=4096, dtype=np.float32):
+        self.columns = tuple(columns)
+        self.dtype = dtype
+        self._initial_capacity = capacity
+        self._lock = threading.Lock()
+        self._size = 0
+        self._data = {name: np.empty(capacity, dtype=dtype) for name in self.columns}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._data[self.columns[0]])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self._data.values())
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name, column in self._data.items():
+            grown = np.empty(new_capacity, dtype=self.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def append(self, **values):
+        """Append one row; every column must be given"""
+        with self._lock:
+            if self._size == self.capacity:
+                self._grow()
+            for name in self.columns:
+                self._data[name][self._size] = values[name]
+            # Publish the row only once every column holds it
+            self._size += 1
+
+    def extend(self, **columns):
+        """Append many rows at once from equally long sequences"""
+        count = len(columns[self.columns[0]])
+        with self._lock:
+            while self._size + count > self.capacity:
+                self._grow()
+            for name in self.columns:
+                self._data[name][self._size:self._size + count] = columns[name]
+            self._size += count
+
+    def view(self, name):
+        return self._data[name][:self._size]
+
+    def views(self, *names):
+        """Consistent views of several columns, all cut at the same length"""
+        with self._lock:
+            size = self._size
+            return tuple(self._data[name][:size] for name in names or self.columns)
+
+    def __getitem__(self, name):
+        return self.view(name)
+
+    def last(self, name):
+        return float(self._data[name][self._size - 1]) if self._size else None
+
+    def mean(self, name):
+        if not self._size:
+            return 0.0
+        return float(self.view(name).mean(dtype=np.float64))
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            if self.capacity > self._initial_capacity:
+                self._data = {name: np.empty(self._initial_capacity, dtype=self.dtype) for name in self.columns}
+
+    def to_dict(self):
+        return {name: self.view(name).tolist() for name in self.columns}
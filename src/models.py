@@ -0,0 +1,294 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from detectors import DNN_BACKENDS, DNN_TARGETS, LAYOUT_DARKNET, LAYOUT_YOLOV5, Detector
+load_dotenv()
+
+
+def yolo_enabled():
+    return os.getenv('USE_YOLO', 'false').lower() == 'true'
+
+
+def create_face_mesh():
+    """Build a FaceMesh instance; each one carries its own tracking state"""
+    # MediaPipe takes about a second to import, so only pay for it here
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+        refine_landmarks=True
+    )
+
+
+def yolo_paths():
+    return (
+        os.getenv('YOLO_WEIGHTS_PATH', 'yolov4.weights'),
+        os.getenv('YOLO_CONFIG_PATH', 'yolov4.cfg'),
+        os.getenv('YOLO_NAMES_PATH', 'coco.names'),
+    )
+
+
+DETECTOR_YOLOV4 = "yolov4"
+DETECTOR_YOLOV4_TINY = "yolov4-tiny"
+DETECTOR_ONNX = "onnx"
+DETECTOR_AUTO = "auto"
+
+# Input sizes auto-selection tries for darknet models, most accurate first
+AUTO_INPUT_SIZES = (608, 416, 320)
+
+_auto_choice = None
+_auto_lock = threading.Lock()
+
+
+def detector_candidates():
+    """(name, model, config, layout) for every configured detector, most accurate first"""
+    weights_path, cfg_path, _ = yolo_paths()
+    candidates = [(DETECTOR_YOLOV4, weights_path, cfg_path, LAYOUT_DARKNET)]
+    if os.getenv('ONNX_MODEL_PATH'):
+        candidates.append((DETECTOR_ONNX, os.getenv('ONNX_MODEL_PATH'), None, os.getenv('ONNX_LAYOUT', LAYOUT_YOLOV5)))
+    candidates.append((
+        DETECTOR_YOLOV4_TINY,
+        os.getenv('YOLO_TINY_WEIGHTS_PATH', 'yolov4-tiny.weights'),
+        os.getenv('YOLO_TINY_CONFIG_PATH', 'yolov4-tiny.cfg'),
+        LAYOUT_DARKNET,
+    ))
+    return [
+        candidate for candidate in candidates
+        if all(path is None or os.path.exists(path) for path in candidate[1:3])
+    ]
+
+
+def _read_classes():
+    names_path = yolo_paths()[2]
+    with open(names_path, "r") as f:
+        return [line.strip() for line in f.readlines()]
+
+
+def _build_detector(candidate, classes, input_size=None):
+    name, model_path, config_path, layout = candidate
+    backend = os.getenv('DNN_BACKEND', 'default').lower()
+    target = os.getenv('DNN_TARGET', 'cpu').lower()
+    if os.getenv('DNN_THREADS'):
+        cv2.setNumThreads(int(os.getenv('DNN_THREADS')))
+
+    if backend not in DNN_BACKENDS:
+        raise ValueError(f"DNN_BACKEND {backend} is not available in this OpenCV build")
+    if target not in DNN_TARGETS:
+        raise ValueError(f"DNN_TARGET {target} is not available in this OpenCV build")
+
+    net = cv2.dnn.readNet(model_path, config_path) if config_path else cv2.dnn.readNet(model_path)
+    net.setPreferableBackend(DNN_BACKENDS[backend])
+    net.setPreferableTarget(DNN_TARGETS[target])
+
+    if input_size is None:
+        default_size = '640' if layout != LAYOUT_DARKNET else '416'
+        input_size = int(os.getenv('DETECTOR_INPUT_SIZE', default_size))
+    files = [
+        (os.path.basename(path), os.path.getsize(path))
+        for path in (model_path, config_path, yolo_paths()[2]) if path
+    ]
+    return Detector(
+        net, classes, name, input_size=input_size, layout=layout,
+        max_batch=None if layout == LAYOUT_DARKNET else int(os.getenv('ONNX_MAX_BATCH', '1')),
+        files=files, backend=backend, target=target,
+    )
+
+
+def auto_select_detector(candidates, classes, budget):
+    """Most accurate candidate/input size whose measured latency fits budget seconds.
+
+    Candidates are tried most accurate first, darknet models at every size
+    in AUTO_INPUT_SIZES, and the first one within budget wins. If none fits,
+    the fastest one measured is used.
+    """
+    fastest = None
+    for candidate in candidates:
+        sizes = AUTO_INPUT_SIZES if candidate[3] == LAYOUT_DARKNET else (None,)
+        for size in sizes:
+            detector = _build_detector(candidate, classes, size)
+            latency = detector.measure_latency()
+            print(f"Detector {detector.name} @ {detector.input_size}: {latency * 1000:.1f} ms per frame")
+            if latency <= budget:
+                return detector
+            if fastest is None or latency < fastest[0]:
+                fastest = (latency, detector)
+    if fastest is not None:
+        print(f"No detector fits the {budget * 1000:.0f} ms budget, using the fastest")
+        return fastest[1]
+    return None
+
+
+def load_detector(kind=None):
+    """Build the object detector selected by DETECTOR in .env, or None.
+
+    DETECTOR is yolov4 (default), yolov4-tiny, onnx or auto; auto measures
+    the configured models at startup against DETECTOR_LATENCY_BUDGET_MS.
+    """
+    global _auto_choice
+    kind = (kind or os.getenv('DETECTOR', DETECTOR_YOLOV4)).lower()
+    try:
+        candidates = detector_candidates()
+        if not os.path.exists(yolo_paths()[2]):
+            candidates = []
+        if kind != DETECTOR_AUTO:
+            candidates = [c for c in candidates if c[0] == kind]
+        if not candidates:
+            print("YOLO files missing, object detection disabled")
+            return None
+        classes = _read_classes()
+
+        if kind == DETECTOR_AUTO:
+            with _auto_lock:
+                # Measure once per process; later bundles reuse the choice
+                if _auto_choice is None:
+                    budget = float(os.getenv('DETECTOR_LATENCY_BUDGET_MS', '150')) / 1000
+                    detector = auto_select_detector(candidates, classes, budget)
+                    if detector is not None:
+                        _auto_choice = (detector.name, detector.input_size)
+                    return detector
+            name, size = _auto_choice
+            candidate = next(c for c in candidates if c[0] == name)
+            return _build_detector(candidate, classes, size if candidate[3] == LAYOUT_DARKNET else None)
+
+        detector = _build_detector(candidates[0], classes)
+        print(f"{detector.name} detector initialized ({detector.input_size}x{detector.input_size})")
+        return detector
+    except Exception as e:
+        print(f"YOLO initialization failed: {str(e)}")
+        return None
+
+
+class ModelBundle:
+    """The FaceMesh/detector instances owned by a single analysis session.
+
+    Models are built on first access rather than in the constructor, so
+    creating an analyzer is cheap; warm_up() (or start_warm_up() on a
+    background thread) builds them ahead of the first video.
+    """
+
+    def __init__(self, face_mesh=None, detector=None, use_yolo=None):
+        self._lock = threading.RLock()
+        self._face_mesh = face_mesh
+        self._detector = detector
+        self._detector_pending = detector is None and (yolo_enabled() if use_yolo is None else use_yolo)
+        self.ready = threading.Event()
+        self.warm_up_error = None
+
+    @property
+    def face_mesh(self):
+        if self._face_mesh is None:
+            with self._lock:
+                if self._face_mesh is None:
+                    self._face_mesh = create_face_mesh()
+        return self._face_mesh
+
+    @property
+    def detector(self):
+        if self._detector_pending:
+            with self._lock:
+                if self._detector_pending:
+                    self._detector = load_detector()
+                    self._detector_pending = False
+        return self._detector
+
+    @property
+    def net(self):
+        detector = self.detector
+        return detector.net if detector is not None else None
+
+    @property
+    def classes(self):
+        detector = self.detector
+        return detector.classes if detector is not None else []
+
+    def set_detector(self, detector):
+        with self._lock:
+            self._detector = detector
+            self._detector_pending = False
+
+    def signature(self):
+        """Identify the model files in use, so cached outputs can be matched to them"""
+        import mediapipe as mp
+        detector = self.detector.describe() if self.detector is not None else None
+        return {"face_mesh": mp.__version__, "detector": detector}
+
+    def warm_up(self):
+        """Build the models and run one dummy inference so the first real frame doesn't pay graph setup"""
+        with self._lock:
+            blank = np.zeros((480, 640, 3), dtype=np.uint8)
+            self.face_mesh.process(blank)
+            if self.detector is not None:
+                self.detector.detect_batch([blank])
+            self.reset_tracking()
+        self.ready.set()
+
+    def start_warm_up(self):
+        """warm_up() on a daemon thread; ready is set once it finishes, even if it failed"""
+        def run():
+            try:
+                self.warm_up()
+            except Exception as e:
+                self.warm_up_error = e
+                print(f"Model warm-up failed: {str(e)}")
+            finally:
+                self.ready.set()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def reset_tracking(self):
+        """Drop FaceMesh tracking state so the next video starts from detection"""
+        if self._face_mesh is not None:
+            self._face_mesh.reset()
+
+    def close(self):
+        if self._face_mesh is not None:
+            self._face_mesh.close()
+
+
+class ModelPool:
+    """A fixed set of warmed-up ModelBundles shared by concurrent sessions.
+
+    A bundle is handed to exactly one session at a time, so FaceMesh tracking
+    state never leaks between analyses running in parallel threads.
+    """
+
+    def __init__(self, size=2, warm_up=True, use_yolo=None):
+        self.size = size
+        self._available = queue.Queue()
+        for _ in range(size):
+            bundle = ModelBundle(use_yolo=use_yolo)
+            if warm_up:
+                bundle.warm_up()
+            self._available.put(bundle)
+
+    def acquire(self, timeout=None):
+        return self._available.get(timeout=timeout)
+
+    def release(self, bundle):
+        bundle.reset_tracking()
+        self._available.put(bundle)
+
+    @contextmanager
+    def session(self, timeout=None, run_mode=None):
+        """Yield a VideoAnalyzer bound to a pooled bundle for the duration of one analysis"""
+        from analyzer import VideoAnalyzer
+        bundle = self.acquire(timeout=timeout)
+        try:
+            yield VideoAnalyzer(models=bundle, run_mode=run_mode)
+        finally:
+            self.release(bundle)
+
+    def close(self):
+        while True:
+            try:
+                self._available.get_nowait().close()
+            except queue.Empty:
+                break
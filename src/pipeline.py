@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+
+import cv2
+
+
+class FrameReader(threading.Thread):
+    """Decode-ahead stage that feeds sampled frames to the inference stage.
+
+    Skipped frames are only grab()bed, so they are demuxed but never decoded
+    into a BGR image; sampled frames are retrieve()d and pushed onto a bounded
+    queue as (frame_number, frame) pairs, frame_number being 1-based.
+
+    With start_frame the capture is first seeked there; frame numbers stay
+    absolute and sampling stays on the same grid as a read from frame 0.
+    Reading ends after end_frame when it is set. finished only says that
+    reading reached the end; drained is set once the consumer has also
+    taken every queued frame. With a StageTimer, grab and
+    retrieve calls are timed as the "decode" stage. With a sampling.AdaptiveSampler
+    the sampler decides which frames are retrieved and sampled instead of
+    the fixed frame_skip.
+    """
+
+    def __init__(self, cap, frame_skip, queue_size=8, start_frame=0, end_frame=None, timer=None, sampler=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.frame_skip = frame_skip
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.timer = timer
+        self.sampler = sampler
+        self.frames_read = 0
+        self.finished = False
+        self.drained = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        skip_count = 0
+        if self.start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            self.frames_read = self.start_frame
+            skip_count = self.start_frame % self.frame_skip if self.sampler is None else 0
+        try:
+            while not self._stop_event.is_set():
+                if self.end_frame is not None and self.frames_read >= self.end_frame:
+                    self.finished = True
+                    break
+                if not self._decode(self.cap.grab):
+                    self.finished = True
+                    break
+                self.frames_read += 1
+                skip_count += 1
+                if self.sampler is None and skip_count < self.frame_skip:
+                    continue
+                if self.sampler is not None and not self.sampler.wants(skip_count):
+                    continue
+
+                ret, frame = self._decode(self.cap.retrieve)
+                if not ret:
+                    self.finished = True
+                    break
+                if self.sampler is not None and not self.sampler.accept(self.frames_read, frame, skip_count):
+                    # Only a motion probe
+                    continue
+                skip_count = 0
+                if not self._put((self.frames_read, frame)):
+                    break
+        finally:
+            self._put(None)
+
+    def _decode(self, call):
+        if self.timer is None:
+            return call()
+        with self.timer.stage("decode"):
+            return call()
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def stop(self):
+        self._stop_event.set()
+
+    def batches(self, max_size):
+        """Yield lists of up to max_size decoded items without waiting to fill a window"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.drained = True
+                return
+            window = [item]
+            while len(window) < max_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    yield window
+                    self.drained = True
+                    return
+                window.append(item)
+            yield window
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.drained = True
+                return
+            yield item
+
+
+class RealtimePacer:
+    """Paces sampled frames against the source FPS using wall-clock deadlines.
+
+    Frame N is due at start + (N - first) / fps. A frame that is already more
+    than late_tolerance seconds past its deadline is reported as late so the
+    caller can drop it instead of falling further behind.
+    """
+
+    def __init__(self, fps, late_tolerance):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.late_tolerance = late_tolerance
+        self.start_time = None
+        self.first_frame = 0
+        self.dropped = 0
+
+    def wait(self, frame_number):
+        """Sleep until frame_number is due; returns False if it is too late to show"""
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now
+            self.first_frame = frame_number
+            return True
+
+        deadline = self.start_time + (frame_number - self.first_frame) / self.fps
+        if now > deadline + self.late_tolerance:
+            self.dropped += 1
+            return False
+        if deadline > now:
+            time.sleep(deadline - now)
+        return True
+
+    def shift(self, seconds):
+        """Push every remaining deadline back, e.g. by the time spent paused"""
+        if self.start_time is not None:
+            self.start_time += seconds
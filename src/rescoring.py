@@ -0,0 +1,240 @@
+import itertools
+import os
+
+import numpy as np
+
+from feature_cache import FEATURE_COLUMNS
+from features import GAZE_LEFT, GAZE_RIGHT
+
+# Mirrors the constants in VideoAnalyzer.calculate_cheating_probability,
+# update_smoothed_probability, score_features and generate_final_result
+DEFAULT_CONFIG = {
+    "eye_weight": 0.3,
+    "head_weight": 0.3,
+    "mouth_weight": 0.2,
+    "object_eye_weight": 0.033,
+    "object_head_weight": 0.034,
+    "object_mouth_weight": 0.033,
+    "object_weight": 0.9,
+    "silent_mouth_factor": 0.3,
+    "smoothing": 0.1,
+    "event_threshold": 60.0,
+    "mouth_threshold": 5.0,
+    "mouth_count_limit": 5,
+    "avg_threshold": 50.0,
+}
+
+CALIBRATION_FRAMES = 10
+EMA_BLOCK = 256
+# Configs are scored in chunks whose (configs, frames) float64 temporaries
+# hold at most this many elements each (64 MB)
+SCORE_CHUNK_ELEMENTS = 1 << 23
+
+VERDICT_NO_DATA = "No data available"
+VERDICT_TALKING = "Rejected (Excessive Talking)"
+VERDICT_SUSPICIOUS = "Rejected (Suspicious Behavior)"
+VERDICT_SELECTED = "Selected (No Suspicious Behavior)"
+
+
+def expand_grid(grid):
+    """Cartesian product of a {param: value or [values]} dict, over DEFAULT_CONFIG"""
+    names = list(grid)
+    choices = [grid[name] if isinstance(grid[name], (list, tuple)) else [grid[name]] for name in names]
+    configs = []
+    for values in itertools.product(*choices):
+        config = dict(DEFAULT_CONFIG)
+        config.update(zip(names, values))
+        configs.append(config)
+    return configs
+
+
+def _column(configs, name):
+    return np.array([config[name] for config in configs], dtype=np.float64)[:, None]
+
+
+class VideoFeatures:
+    """The scored rows of one video: per-frame features and object flags"""
+
+    def __init__(self, name, fps, frame_numbers, features, object_detected, object_frames):
+        self.name = name
+        self.fps = fps
+        self.frame_numbers = frame_numbers
+        self.eye = features[:, 0]
+        self.head = features[:, 1]
+        self.mouth = features[:, 2]
+        self.gaze_x = features[:, 3]
+        self.object_detected = object_detected
+        self.object_frames = object_frames
+
+    @classmethod
+    def from_cache_entry(cls, entry, name=None):
+        has_face = np.asarray(entry["has_face"])
+        sampled = np.asarray(entry["frame_numbers"])
+        objects = np.asarray(entry["object_detected"])
+        face_frames = sampled[has_face]
+        scored = face_frames >= CALIBRATION_FRAMES
+        columns = [FEATURE_COLUMNS.index(c) for c in ("eye_tracking", "head_movement", "mouth_movement", "gaze_x")]
+        features = np.asarray(entry["features"], dtype=np.float64)[:, columns][scored]
+        return cls(
+            name=name or entry.meta.get("video"),
+            fps=entry.meta["fps"],
+            frame_numbers=face_frames[scored],
+            features=features,
+            object_detected=objects[has_face][scored],
+            object_frames=sampled[objects],
+        )
+
+
+def exponential_smoothing(values, alphas):
+    """EMA s_t = (1 - a) s_{t-1} + a x_t from s = 0, for every row of values at once.
+
+    values is (configs, frames) and alphas is (configs, 1). The recurrence is
+    evaluated in blocks: inside a block it is a lower-triangular matrix
+    product, and the last smoothed value is carried into the next block.
+    """
+    configs, frames = values.shape
+    smoothed = np.empty_like(values)
+    for alpha in np.unique(alphas):
+        rows = np.flatnonzero(alphas[:, 0] == alpha)
+        decay = 1.0 - alpha
+        steps = np.arange(EMA_BLOCK)
+        exponents = steps[:, None] - steps[None, :]
+        kernel = np.where(exponents >= 0, alpha * decay ** np.maximum(exponents, 0), 0.0)
+        carry_decay = decay ** (steps + 1)
+
+        carry = np.zeros(len(rows))
+        for start in range(0, frames, EMA_BLOCK):
+            block = values[rows, start:start + EMA_BLOCK]
+            n = block.shape[1]
+            out = block @ kernel[:n, :n].T + carry[:, None] * carry_decay[:n]
+            smoothed[rows, start:start + n] = out
+            carry = out[:, -1]
+    return smoothed
+
+
+def score_video(video, configs, keep_smoothed=False):
+    """Score one video under every config, a chunk of configs at a time.
+
+    Each chunk is scored in a single set of array ops, sized so its
+    (configs, frames) temporaries stay within SCORE_CHUNK_ELEMENTS.
+    Returns a dict of per-config arrays plus the list of verdicts; with
+    keep_smoothed it also holds the (configs, frames) smoothed
+    probability series.
+    """
+    chunk = max(1, SCORE_CHUNK_ELEMENTS // max(1, len(video.eye)))
+    parts = [
+        _score_configs(video, configs[start:start + chunk], keep_smoothed)
+        for start in range(0, len(configs), chunk)
+    ]
+    if not parts:
+        parts = [_score_configs(video, [], keep_smoothed)]
+    result = {
+        name: np.concatenate([part[name] for part in parts])
+        for name in ("average", "mouth_count", "high_probability_events")
+    }
+    result["gaze_events"] = parts[0]["gaze_events"]
+    result["object_events"] = parts[0]["object_events"]
+    result["verdicts"] = [verdict for part in parts for verdict in part["verdicts"]]
+    if keep_smoothed:
+        result["smoothed"] = np.concatenate([part["smoothed"] for part in parts])
+    return result
+
+
+def _score_configs(video, configs, keep_smoothed):
+    eye, head, mouth = video.eye[None, :], video.head[None, :], video.mouth[None, :]
+    obj = video.object_detected[None, :]
+
+    mouth_factor = _column(configs, "silent_mouth_factor")
+    normal = (
+        _column(configs, "eye_weight") * eye
+        + _column(configs, "head_weight") * head
+        + _column(configs, "mouth_weight") * mouth * mouth_factor
+    )
+    flagged = (
+        _column(configs, "object_eye_weight") * eye
+        + _column(configs, "object_head_weight") * head
+        + _column(configs, "object_mouth_weight") * mouth * mouth_factor
+        + _column(configs, "object_weight") * 100
+    )
+    raw = np.minimum(100, np.where(obj, flagged, normal))
+    smoothed = exponential_smoothing(raw, _column(configs, "smoothing"))
+
+    high_events = (smoothed > _column(configs, "event_threshold")).sum(axis=1)
+    mouth_count = (mouth > _column(configs, "mouth_threshold")).sum(axis=1)
+    average = smoothed.mean(axis=1) if smoothed.shape[1] else np.zeros(len(configs))
+    gaze_events = int(((video.gaze_x < GAZE_LEFT) | (video.gaze_x > GAZE_RIGHT)).sum())
+
+    limits = _column(configs, "mouth_count_limit")[:, 0]
+    verdicts = np.where(
+        mouth_count > limits, VERDICT_TALKING,
+        np.where(average > _column(configs, "avg_threshold")[:, 0], VERDICT_SUSPICIOUS, VERDICT_SELECTED)
+    )
+    if smoothed.shape[1] == 0:
+        verdicts = np.full(len(configs), VERDICT_NO_DATA)
+
+    result = {
+        "average": average,
+        "mouth_count": mouth_count,
+        "high_probability_events": high_events,
+        "gaze_events": gaze_events,
+        "object_events": len(video.object_frames),
+        "verdicts": verdicts.tolist(),
+    }
+    if keep_smoothed:
+        result["smoothed"] = smoothed
+    return result
+
+
+def sweep(videos, configs, labels=None):
+    """Evaluate every config against every video.
+
+    labels maps a video name (path or basename) to True when the session is
+    known to be cheating; with labels, each config also gets confusion counts
+    and accuracy, and results are sorted best first.
+    """
+    verdicts = {}
+    for video in videos:
+        verdicts[video.name] = score_video(video, configs)["verdicts"]
+
+    results = []
+    for i, config in enumerate(configs):
+        result = {"config": config, "verdicts": {name: v[i] for name, v in verdicts.items()}}
+        if labels:
+            counts = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+            for name, v in verdicts.items():
+                label = labels.get(name, labels.get(os.path.basename(name or "")))
+                if label is None:
+                    continue
+                rejected = v[i].startswith("Rejected")
+                key = ("t" if rejected == bool(label) else "f") + ("p" if rejected else "n")
+                counts[key] += 1
+            total = sum(counts.values())
+            result.update(counts)
+            result["accuracy"] = (counts["tp"] + counts["tn"]) / total if total else None
+        results.append(result)
+
+    if labels:
+        results.sort(key=lambda r: -(r["accuracy"] or 0))
+    return results
+
+
+def load_cached_videos(cache_dir, videos=None):
+    """VideoFeatures for every entry in a feature cache, optionally only for some videos.
+
+    When the same video was cached under several settings, the most
+    recently used entry wins.
+    """
+    from feature_cache import FeatureCache
+
+    cache = FeatureCache(cache_dir)
+    wanted = {os.path.abspath(v) for v in videos} if videos else None
+    loaded = {}
+    for _, _, path in cache.entries():
+        entry = cache.load(os.path.basename(path))
+        if entry is None:
+            continue
+        name = entry.meta.get("video")
+        if wanted is not None and os.path.abspath(name or "") not in wanted:
+            continue
+        loaded[name] = VideoFeatures.from_cache_entry(entry, name)
+    return list(loaded.values())
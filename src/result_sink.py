@@ -0,0 +1,269 @@
+import json
+import os
+import sqlite3
+import time
+
+from events import EventRecord
+from metrics_store import METRIC_COLUMNS
+
+# A session is committed every COMMIT_FRAMES sampled frames or COMMIT_SECONDS
+# seconds, whichever comes first; that is also the most a crash can lose
+COMMIT_FRAMES = 150
+COMMIT_SECONDS = 5.0
+
+SESSION_RUNNING = "running"
+SESSION_DONE = "done"
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY,
+        video TEXT NOT NULL,
+        settings TEXT NOT NULL,
+        fps REAL,
+        status TEXT NOT NULL,
+        last_frame INTEGER NOT NULL DEFAULT 0,
+        state TEXT,
+        final_result TEXT,
+        started_at REAL,
+        updated_at REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS sessions_video ON sessions (video, settings)",
+    f"""CREATE TABLE IF NOT EXISTS frames (
+        session_id INTEGER NOT NULL,
+        row INTEGER NOT NULL,
+        {", ".join(f"{name} REAL" for name in METRIC_COLUMNS)},
+        PRIMARY KEY (session_id, row)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS events (
+        session_id INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        start_frame INTEGER NOT NULL,
+        end_frame INTEGER NOT NULL,
+        peak REAL,
+        count INTEGER NOT NULL,
+        open INTEGER NOT NULL,
+        PRIMARY KEY (session_id, idx)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS detections (
+        session_id INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        frame INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (session_id, idx)
+    ) WITHOUT ROWID""",
+)
+
+# Analyzer attributes that are not derivable from the rows and events but
+# are needed to carry on scoring where a session stopped
+STATE_ATTRIBUTES = (
+    "smoothed_probability", "current_probability", "mouth_movement_count",
+    "baseline_eye", "baseline_head", "dropped_frames",
+)
+
+
+class ResultSink:
+    """Append-only SQLite store that analysis results are streamed into.
+
+    The database runs in WAL mode, so other processes can read a session
+    while it is being written. Each analysis is a session; see SinkSession
+    for what is written and when.
+    """
+
+    def __init__(self, path, commit_frames=COMMIT_FRAMES, commit_seconds=COMMIT_SECONDS):
+        self.path = path
+        self.commit_frames = commit_frames
+        self.commit_seconds = commit_seconds
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss,
+        # never corruption; each commit stays a cheap append to the log
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        return connection
+
+    def open_session(self, video_path, fps, settings, resume=True):
+        """Start a session for video_path, or continue its last unfinished one.
+
+        A session is only resumed when the video file and the analysis
+        settings are unchanged.
+        """
+        connection = self.connect()
+        video = os.path.abspath(video_path)
+        key = json.dumps(
+            {"settings": settings, "size": os.path.getsize(video) if os.path.exists(video) else None},
+            sort_keys=True
+        )
+        row = None
+        if resume:
+            row = connection.execute(
+                "SELECT id, last_frame, state FROM sessions "
+                "WHERE video = ? AND settings = ? AND status != ? ORDER BY id DESC LIMIT 1",
+                (video, key, SESSION_DONE)
+            ).fetchone()
+        if row is not None:
+            return SinkSession(self, connection, row[0], resumed_from=row[1], state=json.loads(row[2] or "{}"))
+
+        now = time.time()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO sessions (video, settings, fps, status, started_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video, key, fps, SESSION_RUNNING, now, now)
+            )
+        return SinkSession(self, connection, cursor.lastrowid)
+
+    def sessions(self):
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                "SELECT id, video, status, last_frame, final_result, updated_at FROM sessions ORDER BY id"
+            ).fetchall()
+        finally:
+            connection.close()
+        keys = ("id", "video", "status", "last_frame", "final_result", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class SinkSession:
+    """One analysis being written to a ResultSink.
+
+    commit() writes everything the analyzer produced since the previous
+    commit in one transaction: new metric rows, new and still-open event
+    intervals, new detections and the scoring state, together with the
+    last sampled frame they cover. Only that delta is written, so a commit
+    costs the same late in a long session as early on, and a crash loses
+    at most one commit interval. The analyzer itself still keeps the whole
+    session's rows and intervals in memory.
+    """
+
+    def __init__(self, sink, connection, session_id, resumed_from=0, state=None):
+        self.sink = sink
+        self.connection = connection
+        self.id = session_id
+        self.resumed_from = resumed_from
+        self.state = state or {}
+        self.last_frame = resumed_from
+        self._rows_synced = 0
+        self._detections_synced = 0
+        self._events_floor = 0
+        self._closed_events = set()
+        self._frames_since_commit = 0
+        self._last_commit = time.perf_counter()
+
+    @property
+    def resumed(self):
+        return self.resumed_from > 0
+
+    def restore(self, analyzer):
+        """Load a resumed session's results back into a freshly reset analyzer"""
+        rows = self.connection.execute(
+            f"SELECT {', '.join(METRIC_COLUMNS)} FROM frames WHERE session_id = ? ORDER BY row", (self.id,)
+        ).fetchall()
+        if rows:
+            columns = list(zip(*rows))
+            analyzer.metrics.extend(**{name: columns[i] for i, name in enumerate(METRIC_COLUMNS)})
+        self._rows_synced = len(rows)
+
+        for idx, type, start, end, peak, count, is_open in self.connection.execute(
+            "SELECT idx, type, start_frame, end_frame, peak, count, open FROM events "
+            "WHERE session_id = ? ORDER BY idx", (self.id,)
+        ):
+            analyzer.events.add_record(EventRecord(type, start, end, peak, count), open=bool(is_open))
+            if not is_open:
+                self._closed_events.add(idx)
+        self._advance_event_floor()
+
+        from detectors import DetectionResult
+        for frame, data in self.connection.execute(
+            "SELECT frame, data FROM detections WHERE session_id = ? ORDER BY idx", (self.id,)
+        ):
+            analyzer.detections.append((frame, DetectionResult.from_dict(json.loads(data))))
+        self._detections_synced = len(analyzer.detections)
+
+        for name in STATE_ATTRIBUTES:
+            if name in self.state:
+                setattr(analyzer, name, self.state[name])
+        analyzer.frame_count = self.resumed_from
+
+    def _advance_event_floor(self):
+        while self._events_floor in self._closed_events:
+            self._closed_events.discard(self._events_floor)
+            self._events_floor += 1
+
+    def frame_done(self, analyzer):
+        """Call once per sampled frame; commits when the batch is due"""
+        self._frames_since_commit += 1
+        if (self._frames_since_commit >= self.sink.commit_frames
+                or time.perf_counter() - self._last_commit >= self.sink.commit_seconds):
+            self.commit(analyzer)
+
+    def commit(self, analyzer, status=SESSION_RUNNING, final_result=None):
+        rows = analyzer.metrics.views(*METRIC_COLUMNS)
+        new_rows = [column[self._rows_synced:].tolist() for column in rows]
+        row_count = len(rows[0])
+
+        open_indices = set(analyzer.events.open_indices())
+        event_rows = []
+        for idx, record in enumerate(analyzer.events.records_from(self._events_floor), self._events_floor):
+            if idx in self._closed_events:
+                continue
+            is_open = idx in open_indices
+            event_rows.append((
+                self.id, idx, record.type, record.start_frame, record.end_frame,
+                record.peak, record.count, int(is_open)
+            ))
+            if not is_open:
+                self._closed_events.add(idx)
+
+        detections = analyzer.detections[self._detections_synced:]
+        state = {name: getattr(analyzer, name) for name in STATE_ATTRIBUTES}
+
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO frames (session_id, row, {', '.join(METRIC_COLUMNS)}) "
+                f"VALUES (?, ?{', ?' * len(METRIC_COLUMNS)})",
+                (
+                    (self.id, self._rows_synced + i, *values)
+                    for i, values in enumerate(zip(*new_rows))
+                )
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO events "
+                "(session_id, idx, type, start_frame, end_frame, peak, count, open) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                event_rows
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO detections (session_id, idx, frame, data) VALUES (?, ?, ?, ?)",
+                (
+                    (self.id, self._detections_synced + i, frame, json.dumps(detection.to_dict()))
+                    for i, (frame, detection) in enumerate(detections)
+                )
+            )
+            self.connection.execute(
+                "UPDATE sessions SET status = ?, last_frame = ?, state = ?, final_result = ?, "
+                "fps = ?, updated_at = ? WHERE id = ?",
+                (status, analyzer.frame_count, json.dumps(state), final_result, analyzer.fps, time.time(), self.id)
+            )
+
+        self._rows_synced = row_count
+        self._detections_synced += len(detections)
+        self._advance_event_floor()
+        self.last_frame = analyzer.frame_count
+        self._frames_since_commit = 0
+        self._last_commit = time.perf_counter()
+
+    def finish(self, analyzer):
+        """Final commit; the session is marked done and will not be resumed"""
+        self.commit(analyzer, SESSION_DONE, analyzer.final_result)
+        self.close()
+
+    def close(self):
+        self.connection.close()
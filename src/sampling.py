@@ -0,0 +1,158 @@
+import threading
+
+import cv2
+import numpy as np
+
+DEFAULT_MIN_RATE = 2.0
+# Mean absolute difference (0-255) between grayscale thumbnails of the
+# last sample and a probed frame that counts as movement
+MOTION_THRESHOLD = 3.0
+# Deviation of a metric from its recent average that counts as activity
+METRIC_DELTAS = {"eye_tracking": 5.0, "head_movement": 10.0, "mouth_movement": 3.0}
+# Smoothed probability above this keeps sampling dense (the level at which
+# the analyzer logs high probability events), as does any rise of
+# PROBABILITY_RISE per sample; a candidate's resting level varies too much
+# for a lower absolute floor
+PROBABILITY_FLOOR = 60.0
+PROBABILITY_RISE = 1.0
+HOLD_SECONDS = 2.0
+TREND_ALPHA = 0.3
+
+
+class AdaptiveSampler:
+    """Chooses how many frames FrameReader skips between samples.
+
+    While the candidate is active the reader samples every min_skip frames
+    (the max rate); during stable periods the skip doubles on each quiet
+    sample up to max_skip (the min rate). Activity is any of:
+
+    - movement: between samples the reader still retrieves a probe frame
+      every min_skip frames and compares a small grayscale thumbnail with
+      the last sample's, so a glance shorter than the sparse interval is
+      promoted to a sample as soon as it starts (probes cost a retrieve and
+      a resize, never inference);
+    - a head/eye/mouth metric leaving its recent average, a smoothed
+      probability above PROBABILITY_FLOOR or rising, a face
+      appearing or disappearing, or a prohibited object (observe()).
+
+    After activity the dense rate is held for hold_seconds of video. The
+    reader thread calls wants()/accept(), the analysis thread observe(), so
+    shared state is kept under a lock.
+    """
+
+    def __init__(self, fps, min_rate=DEFAULT_MIN_RATE, max_rate=None, frame_skip=4,
+                 motion_threshold=MOTION_THRESHOLD, hold_seconds=HOLD_SECONDS, thumb_size=(64, 36)):
+        fps = fps if fps and fps > 0 else 30.0
+        self.fps = fps
+        max_rate = max_rate or fps / frame_skip
+        self.min_skip = max(1, int(round(fps / max_rate)))
+        self.max_skip = max(self.min_skip, int(round(fps / min_rate)))
+        self.motion_threshold = motion_threshold
+        self.hold_frames = int(round(hold_seconds * fps))
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self.skip = self.min_skip
+        self.active_until = self.hold_frames
+        self._reference = None
+        self._trend = {}
+        self._last_probability = None
+        self._had_face = None
+        self.samples = 0
+        self.probes = 0
+        self.promoted = 0
+        self.dense_samples = 0
+        self.first_frame = None
+        self.last_frame = None
+
+    def settings(self):
+        """Everything that changes which frames get sampled, part of the cache key"""
+        return {
+            "min_skip": self.min_skip,
+            "max_skip": self.max_skip,
+            "motion_threshold": self.motion_threshold,
+            "hold_frames": self.hold_frames,
+        }
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _activate(self, frame_number):
+        self.skip = self.min_skip
+        self.active_until = max(self.active_until, frame_number + self.hold_frames)
+
+    def wants(self, since_last):
+        """Should the reader retrieve the frame since_last frames after the last sample?"""
+        with self._lock:
+            return since_last >= self.skip or since_last % self.min_skip == 0
+
+    def accept(self, frame_number, frame, since_last):
+        """Decide on a retrieved frame: True to sample it, False if it was only a probe"""
+        thumb = self._thumbnail(frame)
+        with self._lock:
+            moved = (
+                self._reference is not None
+                and float(np.abs(thumb - self._reference).mean()) > self.motion_threshold
+            )
+            if moved:
+                if since_last < self.skip:
+                    self.promoted += 1
+                self._activate(frame_number)
+            elif since_last < self.skip:
+                self.probes += 1
+                return False
+
+            if frame_number > self.active_until:
+                self.skip = min(self.max_skip, self.skip * 2)
+            self._reference = thumb
+            self.samples += 1
+            if since_last <= self.min_skip:
+                self.dense_samples += 1
+            if self.first_frame is None:
+                self.first_frame = frame_number - since_last
+            self.last_frame = frame_number
+            return True
+
+    def observe(self, frame_number, scores=None, face_found=True, object_detected=False):
+        """Feed back the analysis of a sampled frame; scores is (eye, head, mouth, probability)"""
+        with self._lock:
+            active = object_detected or (self._had_face is not None and face_found != self._had_face)
+            self._had_face = face_found
+            if scores is not None:
+                probability = scores[3]
+                for name, value in zip(METRIC_DELTAS, scores[:3]):
+                    average = self._trend.get(name)
+                    if average is not None and abs(value - average) > METRIC_DELTAS[name]:
+                        active = True
+                    self._trend[name] = value if average is None else average + TREND_ALPHA * (value - average)
+                if probability > PROBABILITY_FLOOR:
+                    active = True
+                elif self._last_probability is not None and probability - self._last_probability > PROBABILITY_RISE:
+                    active = True
+                self._last_probability = probability
+            if active:
+                self._activate(frame_number)
+
+    def effective_rate(self):
+        """Sampled frames per second of video covered so far"""
+        with self._lock:
+            if self.first_frame is None or self.last_frame <= self.first_frame:
+                return None
+            return self.samples * self.fps / (self.last_frame - self.first_frame)
+
+    def stats(self):
+        rate = self.effective_rate()
+        with self._lock:
+            covered = (self.last_frame - self.first_frame) if self.first_frame is not None else 0
+            full_rate_samples = covered // self.min_skip
+            return {
+                "min_rate": round(self.fps / self.max_skip, 3),
+                "max_rate": round(self.fps / self.min_skip, 3),
+                "effective_rate": round(rate, 3) if rate is not None else None,
+                "samples": self.samples,
+                "full_rate_samples": full_rate_samples,
+                "saved": round(1 - self.samples / full_rate_samples, 4) if full_rate_samples else None,
+                "dense_samples": self.dense_samples,
+                "probes": self.probes,
+                "promoted": self.promoted,
+            }
@@ -0,0 +1,442 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_PRIORITY = 0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Finished jobs kept for GET /jobs/<id> before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+
+
+class Job:
+    """One submitted analysis and the updates it has produced so far.
+
+    Updates (progress, events, the final result) are appended to a list
+    that only grows, so any number of clients can follow a job by index
+    and a client that connects late still sees everything from the start.
+    """
+
+    def __init__(self, job_id, video, priority=DEFAULT_PRIORITY):
+        self.id = job_id
+        self.video = video
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.record = None
+        self.error = None
+        self.analyzer = None
+        self.cancel_requested = False
+        self.updates = []
+        self._condition = threading.Condition()
+
+    def publish(self, update):
+        with self._condition:
+            self.updates.append(update)
+            self._condition.notify_all()
+
+    def follow(self, timeout=None):
+        """Yield every update from the first one on, until the job has finished"""
+        index = 0
+        while True:
+            with self._condition:
+                while index == len(self.updates) and self.status not in FINISHED_STATES:
+                    if not self._condition.wait(timeout):
+                        break
+                pending = self.updates[index:]
+                finished = self.status in FINISHED_STATES
+            index += len(pending)
+            yield from pending
+            if finished and index == len(self.updates):
+                return
+
+    def finish(self, status, record=None, error=None):
+        with self._condition:
+            self.status = status
+            self.record = record
+            self.error = error
+            self.finished_at = time.time()
+            self.analyzer = None
+            self.updates.append(self._final_update())
+            self._condition.notify_all()
+
+    def _final_update(self):
+        update = {"type": "result", "status": self.status}
+        if self.record is not None:
+            update["final_result"] = self.record["final_result"]
+            update["record"] = self.record
+        if self.error is not None:
+            update["error"] = self.error
+        return update
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "video": self.video,
+            "priority": self.priority,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "final_result": self.record["final_result"] if self.record else None,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Priority queue of jobs: higher priority first, then submission order"""
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def put(self, job):
+        with self._condition:
+            heapq.heappush(self._heap, (-job.priority, next(self._order), job))
+            self._condition.notify()
+
+    def get(self):
+        """Block until a job is available; None once the queue is closed"""
+        with self._condition:
+            while not self._heap and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def remove(self, job):
+        with self._condition:
+            for i, entry in enumerate(self._heap):
+                if entry[2] is job:
+                    self._heap[i] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    return True
+        return False
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class AnalysisService:
+    """Runs queued jobs on worker threads that borrow warmed-up models from a ModelPool.
+
+    There are exactly as many workers as pooled model bundles, so the
+    number of concurrent analyses on the box is fixed by one setting and
+    no job ever pays for loading FaceMesh or the detector.
+    """
+
+    def __init__(self, workers=2, model_pool=None):
+        from models import ModelPool
+        self.workers = workers
+        self.model_pool = model_pool if model_pool is not None else ModelPool(size=workers)
+        self.queue = JobQueue()
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self.started_at = time.time()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, video, priority=DEFAULT_PRIORITY):
+        with self._lock:
+            job = Job(str(next(self._ids)), video, priority)
+            self.jobs[job.id] = job
+            self._forget_finished()
+        self.queue.put(job)
+        return job
+
+    def _forget_finished(self):
+        finished = [job for job in self.jobs.values() if job.status in FINISHED_STATES]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return [job.summary() for job in self.jobs.values()]
+
+    def cancel(self, job):
+        """Drop a queued job, or stop a running one after its current frame"""
+        job.cancel_requested = True
+        if self.queue.remove(job):
+            job.finish(JOB_CANCELLED)
+            return True
+        analyzer = job.analyzer
+        if analyzer is not None:
+            analyzer.stop()
+            return True
+        # Taken off the queue but not started yet: the worker sees
+        # cancel_requested and finishes the job as cancelled
+        return job.status not in FINISHED_STATES
+
+    def _work(self):
+        from analyzer import RUN_MODE_MAX_THROUGHPUT
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if job.cancel_requested:
+                # cancel() ran after get() took the job but before remove()
+                if job.status not in FINISHED_STATES:
+                    job.finish(JOB_CANCELLED)
+                continue
+            try:
+                with self.model_pool.session(run_mode=RUN_MODE_MAX_THROUGHPUT) as analyzer:
+                    self._run(job, analyzer)
+            except Exception as e:
+                print(f"Job {job.id} ({job.video}) failed: {str(e)}")
+                job.finish(JOB_FAILED, error=str(e))
+
+    def _run(self, job, analyzer):
+        from batch import analyze_to_record
+        job.analyzer = analyzer
+        if job.cancel_requested:
+            # Cancelled between leaving the queue and getting a session
+            job.finish(JOB_CANCELLED)
+            return
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        job.publish({"type": "started", "video": job.video})
+        last_progress = [-1]
+
+        def publish_events():
+            for record in analyzer.events.drain_pending():
+                job.publish(dict(record.to_dict(), type="event", text=record.format(analyzer.fps).strip()))
+
+        def on_progress(progress):
+            # Called for every sampled frame; only whole percents go out
+            if job.cancel_requested and analyzer.is_analyzing:
+                # A cancel that landed before the analysis set is_analyzing
+                # was overwritten by it
+                analyzer.stop()
+            percent = int(progress)
+            if percent != last_progress[0]:
+                last_progress[0] = percent
+                job.publish({
+                    "type": "progress",
+                    "percent": percent,
+                    "frame": analyzer.frame_count,
+                    "probability": round(float(analyzer.smoothed_probability), 2),
+                })
+            publish_events()
+
+        record = analyze_to_record(analyzer, job.video, progress_callback=on_progress)
+        publish_events()
+
+        if job.cancel_requested:
+            job.finish(JOB_CANCELLED, record=record)
+        elif record["status"] != "ok":
+            job.finish(JOB_FAILED, record=record, error=f"Cannot open video file: {job.video}")
+        else:
+            job.finish(JOB_DONE, record=record)
+
+    def metrics_snapshot(self):
+        """Queue, worker and job state plus the process-wide pipeline metrics (None when off)"""
+        from instrumentation import current_shared_metrics
+        with self._lock:
+            jobs = list(self.jobs.values())
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        running = {}
+        for job in jobs:
+            analyzer = job.analyzer
+            if job.status == JOB_RUNNING and analyzer is not None:
+                running[job.id] = {
+                    "video": job.video,
+                    "frame": analyzer.frame_count,
+                }
+        pipeline = current_shared_metrics()
+        return {
+            "timestamp": time.time(),
+            "uptime_s": round(time.time() - self.started_at, 3),
+            "workers": self.workers,
+            "queue_depth": len(self.queue),
+            "jobs": counts,
+            "running": running,
+            "pipeline": pipeline.snapshot() if pipeline is not None else None,
+        }
+
+    def close(self):
+        self.queue.close()
+        for job in list(self.jobs.values()):
+            if job.analyzer is not None:
+                job.analyzer.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.model_pool.close()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API over an AnalysisService.
+
+    POST /jobs                 {"video": path, "priority": n} -> 202 with the job
+    GET  /jobs                 every known job
+    GET  /jobs/<id>            one job, with its result record once finished
+    GET  /jobs/<id>/stream     newline-delimited JSON updates until the job ends
+    DELETE /jobs/<id>          cancel a queued or running job
+    GET  /metrics              AnalysisService.metrics_snapshot()
+    """
+
+    server_version = "ProctoringJobServer/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_or_404(self, job_id):
+        job = self.service.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"Unknown job: {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts == ["jobs"]:
+            self._send_json(200, self.service.list_jobs())
+        elif parts == ["metrics"]:
+            self._send_json(200, self.service.metrics_snapshot())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                payload = job.summary()
+                payload["record"] = job.record
+                self._send_json(200, payload)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._stream(job)
+        else:
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+
+    def _stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for update in job.follow():
+                self.wfile.write(json.dumps(update).encode() + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            pass
+
+    def do_POST(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts != ["jobs"]:
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            video = body["video"]
+            priority = int(body.get("priority", DEFAULT_PRIORITY))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Expected {{\"video\": path, \"priority\": n}}: {str(e)}"})
+            return
+        if not os.path.isfile(video):
+            self._send_json(400, {"error": f"No such video file: {video}"})
+            return
+        job = self.service.submit(os.path.abspath(video), priority)
+        self._send_json(202, job.summary())
+
+    def do_DELETE(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+            return
+        job = self._job_or_404(parts[1])
+        if job is not None:
+            cancelled = self.service.cancel(job)
+            self._send_json(200 if cancelled else 409, job.summary())
+
+
+class JobServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+        super().__init__((host, port), JobRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, verbose=False):
+    """Warm up the model pool, then serve jobs until interrupted"""
+    print(f"Loading {workers} model bundles...")
+    service = AnalysisService(workers=workers)
+    service.start()
+    server = JobServer(service, host, port, verbose)
+    print(f"Job server listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def submit_job(video, host=DEFAULT_HOST, port=DEFAULT_PORT, priority=DEFAULT_PRIORITY):
+    """Submit a job to a running server and yield its streamed updates"""
+    from http.client import HTTPConnection
+    connection = HTTPConnection(host, port)
+    body = json.dumps({"video": os.path.abspath(video), "priority": priority})
+    connection.request("POST", "/jobs", body, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    job = json.loads(response.read())
+    if response.status != 202:
+        raise RuntimeError(job.get("error", f"HTTP {response.status}"))
+
+    connection.request("GET", f"/jobs/{job['id']}/stream")
+    response = connection.getresponse()
+    try:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        connection.close()
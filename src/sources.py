@@ -0,0 +1,206 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_STREAM_FPS = 30.0
+
+
+class SyntheticSource:
+    """Camera stand-in that renders a moving test pattern at a fixed rate.
+
+    Like a real device it paces read() to its frame rate, so consumers that
+    fall behind see frames pile up and have to drop them.
+    """
+
+    def __init__(self, width=640, height=480, fps=DEFAULT_STREAM_FPS, max_frames=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.max_frames = max_frames
+        self.frames_read = 0
+        self._next_time = None
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def read(self):
+        if not self._open or (self.max_frames is not None and self.frames_read >= self.max_frames):
+            return False, None
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time += 1 / self.fps
+
+        t = self.frames_read / self.fps
+        frame = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+        cx = int(self.width / 2 + self.width / 4 * np.sin(t))
+        cy = int(self.height / 2)
+        cv2.circle(frame, (cx, cy), self.height // 5, (200, 180, 160), -1)
+        self.frames_read += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return 0
+
+    def release(self):
+        self._open = False
+
+
+class FileReplaySource:
+    """Plays a video file back at its native frame rate, like a live camera"""
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_STREAM_FPS
+        self._next_time = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time += 1 / self.fps
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            # A live source has no known length
+            return 0
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(spec):
+    """Open a live source from a CLI-style spec.
+
+    "0", "1", ... open a capture device; URLs (rtsp://, http://, ...) open
+    a network stream; "synthetic" or "synthetic:WIDTHxHEIGHT@FPS" renders a
+    test pattern; "replay:PATH" plays a file back in real time.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    if spec.startswith("synthetic"):
+        width, height, fps = 640, 480, DEFAULT_STREAM_FPS
+        if ":" in spec:
+            size, _, rate = spec.split(":", 1)[1].partition("@")
+            width, height = (int(v) for v in size.split("x"))
+            fps = float(rate) if rate else fps
+        return SyntheticSource(width, height, fps)
+    if spec.startswith("replay:"):
+        return FileReplaySource(spec[len("replay:"):])
+    if "://" in spec:
+        return cv2.VideoCapture(spec, cv2.CAP_FFMPEG)
+    return FileReplaySource(spec)
+
+
+class LatestFrameReader(threading.Thread):
+    """Reads a live source as fast as it delivers and keeps only the newest frame.
+
+    Each frame is stamped with its sequence number (1-based, counting every
+    frame the source delivered) and its capture time. A frame the consumer
+    has not taken before the next one arrives is overwritten and counted as
+    dropped, so the consumer never works through a backlog.
+    """
+
+    def __init__(self, source):
+        super().__init__(daemon=True)
+        self.source = source
+        self.frames_read = 0
+        self.dropped = 0
+        self.finished = False
+        self._item = None
+        self._taken_seq = 0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = self.source.read()
+                captured_at = time.perf_counter()
+                if not ret:
+                    break
+                with self._condition:
+                    self.frames_read += 1
+                    if self._item is not None and self._item[0] != self._taken_seq:
+                        self.dropped += 1
+                    self._item = (self.frames_read, captured_at, frame)
+                    self._condition.notify()
+        finally:
+            with self._condition:
+                self.finished = True
+                self._condition.notify()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def take(self, timeout=None):
+        """Wait for a frame newer than the last one taken; None once the source has ended"""
+        with self._condition:
+            while self._item is None or self._item[0] == self._taken_seq:
+                if self.finished or self._stop_event.is_set():
+                    return None
+                if not self._condition.wait(timeout):
+                    return None
+            self._taken_seq = self._item[0]
+            return self._item
+
+    def __iter__(self):
+        while True:
+            item = self.take()
+            if item is None:
+                return
+            yield item
+
+
+class LatencyStats:
+    """Capture-to-verdict latency of processed frames, in seconds"""
+
+    def __init__(self):
+        self.latencies = []
+        self.late = 0
+
+    def add(self, latency, target=None):
+        self.latencies.append(latency)
+        if target is not None and latency > target:
+            self.late += 1
+
+    def summary(self):
+        if not self.latencies:
+            return {"frames": 0}
+        values = np.asarray(self.latencies) * 1000
+        return {
+            "frames": len(values),
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "max_ms": round(float(values.max()), 2),
+            "over_target": self.late,
+        }
@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import cv2
 from analyzer import VideoAnalyzer
 import os
 from PIL import Image, ImageTk
+from downsample import MinMaxDownsampler
+from frame_mailbox import FrameMailbox
+
+GRAPH_INITIAL_SECONDS = 60
+GRAPH_INITIAL_MOVEMENT = 100
+DISPLAY_INTERVAL_MS = 33
 
 class EnhancedVideoUI:
     def __init__(self, root):
@@ -15,16 +18,36 @@ class EnhancedVideoUI:
         self.root.geometry("1200x800")
         self.root.configure(bg="#f0f0f0")
         
+        # Honors RUN_MODE from .env (max_throughput by default); the display
+        # is paced on its own by refresh_display
         self.analyzer = VideoAnalyzer()
-        self.analyzer.ui_callback = self.update_log
+        self.frame_mailbox = FrameMailbox()
+        self.analysis_thread = None
+        self.analysis_ok = True
+        self.pending_progress = None
+        self._stop_requested = False
+        self.models_ready = False
+        self.graphs_ready = False
         self.setup_ui()
         
         self.update_id = None
         self.video_image = None
+        self.video_item = None
+        self.refresh_display()
+
+        # Models build on a background thread while the window is idle;
+        # matplotlib is imported once the window has been drawn
+        self.status_label.config(text="Loading models...")
+        self.analyzer.models.start_warm_up()
+        self.root.after_idle(self.setup_graphs)
 
-    def update_log(self, log_msg):
-        self.log_text.insert(tk.END, log_msg)
-        self.log_text.see(tk.END)
+    def update_log(self):
+        """Append every event interval closed since the last call in one insert"""
+        records = self.analyzer.events.drain_pending()
+        if records:
+            fps = self.analyzer.fps
+            self.log_text.insert(tk.END, "".join(record.format(fps) for record in records))
+            self.log_text.see(tk.END)
         
     def setup_ui(self):
         main_frame = ttk.Frame(self.root)
@@ -56,13 +79,32 @@ class EnhancedVideoUI:
         
         self.video_canvas = tk.Canvas(video_frame, bg="black")
         self.video_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.video_canvas.bind("<Configure>", self.on_video_canvas_resize)
         
-        graphs_frame = ttk.LabelFrame(content_frame, text="Real-time Metrics")
-        graphs_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(5, 0))
+        self.graphs_frame = ttk.LabelFrame(content_frame, text="Real-time Metrics")
+        self.graphs_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(5, 0))
 
-        self.log_text = tk.Text(graphs_frame, height=10, width=60)
+        self.log_text = tk.Text(self.graphs_frame, height=10, width=60)
         self.log_text.pack(fill=tk.BOTH, padx=5, pady=5)
-            
+        
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(fill=tk.X, pady=5)
+        
+        self.progress_var = tk.DoubleVar()
+        self.progress = ttk.Progressbar(status_frame, variable=self.progress_var, length=100)
+        self.progress.pack(fill=tk.X, side=tk.TOP)
+        
+        self.status_label = ttk.Label(status_frame, text="Ready")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        
+        self.result_label = ttk.Label(status_frame, text="", font=("Arial", 10, "bold"))
+        self.result_label.pack(side=tk.RIGHT, padx=5)
+
+    def setup_graphs(self):
+        """Build the matplotlib figure; deferred so the window appears without waiting for matplotlib"""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
         self.fig = Figure(figsize=(6, 8), dpi=100)
         self.fig.patch.set_facecolor('#f0f0f0')
         
@@ -81,25 +123,33 @@ class EnhancedVideoUI:
         
         self.ax2.axhline(y=30, color='green', linestyle='-', alpha=0.3)
         self.ax2.axhline(y=60, color='red', linestyle='-', alpha=0.3)
-        
-        self.canvas = FigureCanvasTkAgg(self.fig, master=graphs_frame)
+        self.ax2.axhspan(0, 30, alpha=0.2, color='green')
+        self.ax2.axhspan(30, 60, alpha=0.2, color='yellow')
+        self.ax2.axhspan(60, 100, alpha=0.2, color='red')
+
+        # Artists are created once and only get new data; animated artists
+        # are left out of full redraws and blitted over a cached background.
+        self.eye_line, = self.ax1.plot([], [], label="Eye Movement", color='cyan', animated=True)
+        self.head_line, = self.ax1.plot([], [], label="Head Movement", color='lime', animated=True)
+        self.mouth_line, = self.ax1.plot([], [], label="Mouth Movement", color='magenta', animated=True)
+        self.ax1.legend(loc='upper left')
+        self.probability_line, = self.ax2.plot([], [], label="Cheating Probability", color='red',
+                                               linewidth=2, animated=True)
+        self.current_marker, = self.ax2.plot([], [], 'o', color='blue', markersize=10,
+                                             zorder=5, animated=True)
+        self.animated_artists = {
+            self.ax1: (self.eye_line, self.head_line, self.mouth_line),
+            self.ax2: (self.probability_line, self.current_marker),
+        }
+        self.reset_graphs()
+        
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.graphs_frame)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.fig.tight_layout()
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        status_frame = ttk.Frame(main_frame)
-        status_frame.pack(fill=tk.X, pady=5)
-        
-        self.progress_var = tk.DoubleVar()
-        self.progress = ttk.Progressbar(status_frame, variable=self.progress_var, length=100)
-        self.progress.pack(fill=tk.X, side=tk.TOP)
-        
-        self.status_label = ttk.Label(status_frame, text="Ready")
-        self.status_label.pack(side=tk.LEFT, padx=5)
-        
-        self.result_label = ttk.Label(status_frame, text="", font=("Arial", 10, "bold"))
-        self.result_label.pack(side=tk.RIGHT, padx=5)
-        
-        self.fig.tight_layout()
+        self.graphs_ready = True
     
     def upload_video(self):
         file_path = filedialog.askopenfilename(
@@ -109,8 +159,11 @@ class EnhancedVideoUI:
         if file_path:
             self.analyzer.video_path = file_path
             self.file_label.config(text=f"File: {os.path.basename(file_path)}")
-            self.analyze_btn.config(state="normal")
-            self.status_label.config(text="Video loaded. Ready to analyze.")
+            if self.models_ready and self.graphs_ready:
+                self.analyze_btn.config(state="normal")
+                self.status_label.config(text="Video loaded. Ready to analyze.")
+            else:
+                self.status_label.config(text="Video loaded. Loading models...")
     
     def analyze_video(self):
         if not self.analyzer.video_path:
@@ -124,14 +177,47 @@ class EnhancedVideoUI:
         self.pause_btn.config(state="normal")
         self.stop_btn.config(state="normal")
         self.log_text.delete(1.0, tk.END)
+        self.analyzer.events.clear()
+        # Start the graphs from scratch: a resumed or cached run can refill
+        # the store past the old row count before the next refresh
+        self.analyzer.metrics.clear()
+        self.reset_graphs()
+        self.canvas.draw()
+        self.frame_mailbox.clear()
+        self.pending_progress = None
+        self._stop_requested = False
         
-        threading.Thread(
-            target=self.analyzer.analyze_video, 
-            args=(self.analyzer.video_path, self.update_video_frame, self.update_progress),
+        self.analysis_thread = threading.Thread(
+            target=self.run_analysis, 
+            args=(self.analyzer.video_path,),
             daemon=True
-        ).start()
+        )
+        self.analysis_thread.start()
         
         self.start_animation()
+
+    def run_analysis(self, video_path):
+        # Runs on the worker thread: it only hands data over, never touches Tk
+        self.analysis_ok = self.analyzer.analyze_video(
+            video_path, self.frame_mailbox.put, self.report_progress
+        )
+
+    def report_progress(self, progress):
+        self.pending_progress = progress
+
+    def on_analysis_finished(self):
+        self.update_log()
+        if not self.analysis_ok:
+            self.show_open_error()
+        elif not self._stop_requested:
+            self.update_progress(100)
+
+    def show_open_error(self):
+        messagebox.showerror("Error", "Cannot open video file.")
+        self.status_label.config(text="Analysis failed")
+        self.pause_btn.config(state="disabled")
+        self.stop_btn.config(state="disabled")
+        self.analyze_btn.config(state="normal")
     
     def toggle_pause(self):
         if self.analyzer.is_analyzing:
@@ -146,8 +232,10 @@ class EnhancedVideoUI:
     
     def stop_analysis(self):
         if self.analyzer.is_analyzing:
-            self.analyzer.is_analyzing = False
+            self._stop_requested = True
+            self.analyzer.stop()
             self.status_label.config(text="Analysis stopped")
+            self.pause_btn.config(text="Pause")
             self.pause_btn.config(state="disabled")
             self.stop_btn.config(state="disabled")
             self.analyze_btn.config(state="normal")
@@ -155,32 +243,57 @@ class EnhancedVideoUI:
             if self.update_id:
                 self.root.after_cancel(self.update_id)
     
-    def update_video_frame(self, frame):
+    def on_video_canvas_resize(self, event):
+        self.frame_mailbox.set_canvas_size(event.width, event.height)
+        if self.video_item is not None:
+            self.video_canvas.coords(self.video_item, event.width // 2, event.height // 2)
+
+    def refresh_display(self):
+        """Drain the frame mailbox, worker progress and new events at a capped rate on the Tk thread"""
+        frame = self.frame_mailbox.take()
         if frame is not None:
-            canvas_width = self.video_canvas.winfo_width()
-            canvas_height = self.video_canvas.winfo_height()
-            
-            if canvas_width > 1 and canvas_height > 1:
-                frame_height, frame_width = frame.shape[:2]
-                aspect_ratio = frame_width / frame_height
-                
-                if canvas_width / canvas_height > aspect_ratio:
-                    new_height = canvas_height
-                    new_width = int(new_height * aspect_ratio)
-                else:
-                    new_width = canvas_width
-                    new_height = int(new_width / aspect_ratio)
-                
-                frame = cv2.resize(frame, (new_width, new_height))
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
-                self.video_image = ImageTk.PhotoImage(image=img)
-                
-                self.video_canvas.delete("all")
-                self.video_canvas.create_image(
-                    canvas_width // 2, canvas_height // 2, 
+            self.update_video_frame(frame)
+
+        if self.pending_progress is not None:
+            progress, self.pending_progress = self.pending_progress, None
+            self.update_progress(progress)
+
+        self.update_log()
+
+        if not self.models_ready and self.graphs_ready and self.analyzer.models.ready.is_set():
+            self.on_models_ready()
+
+        if self.analysis_thread is not None and not self.analysis_thread.is_alive():
+            self.analysis_thread = None
+            self.on_analysis_finished()
+
+        self.root.after(DISPLAY_INTERVAL_MS, self.refresh_display)
+
+    def on_models_ready(self):
+        self.models_ready = True
+        if self.analyzer.models.warm_up_error is not None:
+            self.status_label.config(text="Model loading failed")
+            return
+        if self.analyzer.video_path:
+            self.analyze_btn.config(state="normal")
+            self.status_label.config(text="Video loaded. Ready to analyze.")
+        else:
+            self.status_label.config(text="Ready")
+
+    def update_video_frame(self, frame):
+        """Show an RGB frame already sized to the canvas, reusing the image item"""
+        img = Image.fromarray(frame)
+        if self.video_image is not None and (self.video_image.width(), self.video_image.height()) == img.size:
+            self.video_image.paste(img)
+        else:
+            self.video_image = ImageTk.PhotoImage(image=img)
+            if self.video_item is None:
+                self.video_item = self.video_canvas.create_image(
+                    self.video_canvas.winfo_width() // 2, self.video_canvas.winfo_height() // 2,
                     image=self.video_image, anchor=tk.CENTER
                 )
+            else:
+                self.video_canvas.itemconfig(self.video_item, image=self.video_image)
     
     def update_progress(self, progress):
         self.progress_var.set(progress)
@@ -193,50 +306,78 @@ class EnhancedVideoUI:
             self.analyze_btn.config(state="normal")
     
     def start_animation(self):
+        if self.update_id:
+            self.root.after_cancel(self.update_id)
         self.update_graphs()
     
+    def reset_graphs(self):
+        self.plotted_rows = 0
+        self.x_limit = GRAPH_INITIAL_SECONDS
+        self.movement_limit = GRAPH_INITIAL_MOVEMENT
+        self.ax1.set_xlim(0, self.x_limit)
+        self.ax1.set_ylim(0, self.movement_limit)
+        self.ax2.set_xlim(0, self.x_limit)
+        for artists in self.animated_artists.values():
+            for artist in artists:
+                artist.set_data([], [])
+        self.downsampler = MinMaxDownsampler(0, self.x_limit, self.ax1.bbox.width)
+
+    def on_draw(self, event):
+        """Cache the static background after every full draw (startup, resize, rescale)"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.downsampler.reset(0, self.x_limit, self.ax1.bbox.width)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for ax, artists in self.animated_artists.items():
+            for artist in artists:
+                ax.draw_artist(artist)
+
+    def rescale_graphs(self, last_time, max_movement):
+        """Grow the axes limits with headroom; returns True if a full redraw is needed"""
+        rescaled = False
+        if last_time > self.x_limit:
+            while last_time > self.x_limit:
+                self.x_limit *= 2
+            self.ax1.set_xlim(0, self.x_limit)
+            self.ax2.set_xlim(0, self.x_limit)
+            rescaled = True
+        if max_movement > self.movement_limit:
+            while max_movement > self.movement_limit:
+                self.movement_limit *= 1.5
+            self.ax1.set_ylim(0, self.movement_limit)
+            rescaled = True
+        return rescaled
+
     def update_graphs(self):
-        if not self.analyzer.is_analyzing and len(self.analyzer.time_data) == 0:
-            self.update_id = self.root.after(100, self.update_graphs)
-            return
-        
-        self.ax1.clear()
-        self.ax2.clear()
-        
-        self.ax1.set_title("Movement Tracking")
-        self.ax1.set_xlabel("Time (seconds)")
-        self.ax1.set_ylabel("Movement Intensity")
-        self.ax1.grid(True, linestyle='--', alpha=0.7)
-        
-        self.ax2.set_title("Cheating Probability")
-        self.ax2.set_xlabel("Time (seconds)")
-        self.ax2.set_ylabel("Probability (%)")
-        self.ax2.set_ylim(0, 100)
-        self.ax2.grid(True, linestyle='--', alpha=0.7)
-        
-        self.ax2.axhline(y=30, color='green', linestyle='-', alpha=0.3)
-        self.ax2.axhline(y=60, color='red', linestyle='-', alpha=0.3)
-        
-        if len(self.analyzer.time_data) > 0:
-            self.ax1.plot(self.analyzer.time_data, self.analyzer.eye_tracking_data, 
-                         label="Eye Movement", color='cyan')
-            self.ax1.plot(self.analyzer.time_data, self.analyzer.head_movement_data, 
-                         label="Head Movement", color='lime')
-            self.ax1.plot(self.analyzer.time_data, self.analyzer.mouth_movement_data, 
-                         label="Mouth Movement", color='magenta')
-            self.ax1.legend(loc='upper left')
-            
-            self.ax2.plot(self.analyzer.time_data, self.analyzer.cheating_probability_data, 
-                         label="Cheating Probability", color='red', linewidth=2)
-            
-            self.ax2.axhspan(0, 30, alpha=0.2, color='green')
-            self.ax2.axhspan(30, 60, alpha=0.2, color='yellow')
-            self.ax2.axhspan(60, 100, alpha=0.2, color='red')
-            
-            if len(self.analyzer.time_data) > 0:
-                self.ax2.scatter([self.analyzer.time_data[-1]], [self.analyzer.current_probability], 
-                                color='blue', s=100, zorder=5)
-        
-        self.fig.tight_layout()
-        self.canvas.draw()
-        self.update_id = self.root.after(100, self.update_graphs)
\ No newline at end of file
+        time_data, eye_data, head_data, mouth_data, probability_data = self.analyzer.metrics.views()
+        rows = len(time_data)
+        if rows < self.plotted_rows:
+            # A new analysis started; the store was cleared
+            self.reset_graphs()
+            self.canvas.draw()
+
+        if rows > 0 and rows != self.plotted_rows:
+            self.plotted_rows = rows
+            x, (eye, head, mouth, probability) = self.downsampler.update(
+                time_data, eye_data, head_data, mouth_data, probability_data
+            )
+            max_movement = max(eye.max(), head.max(), mouth.max())
+            if self.rescale_graphs(float(time_data[-1]), max_movement):
+                self.canvas.draw()
+                x, (eye, head, mouth, probability) = self.downsampler.update(
+                    time_data, eye_data, head_data, mouth_data, probability_data
+                )
+
+            self.eye_line.set_data(x, eye)
+            self.head_line.set_data(x, head)
+            self.mouth_line.set_data(x, mouth)
+            self.probability_line.set_data(x, probability)
+            self.current_marker.set_data([time_data[-1]], [self.analyzer.current_probability])
+
+            if self.background is not None:
+                self.canvas.restore_region(self.background)
+                self.draw_animated()
+                self.canvas.blit(self.fig.bbox)
+
+        self.update_id = self.root.after(100, self.update_graphs)